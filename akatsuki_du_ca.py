@@ -4,14 +4,17 @@ Custom bot model
 
 import os
 from time import time
+from typing import TYPE_CHECKING
 
 from aiohttp import ClientSession
 from discord import Intents
 from discord.ext.commands import Bot
-from discord.ext.ipc.server import Server
 
 from modules.vault import Config
 
+if TYPE_CHECKING:
+    from discord.ext.ipc.server import Server
+
 
 class AkatsukiDuCa(Bot):
     """
@@ -21,7 +24,7 @@ class AkatsukiDuCa(Bot):
     def __init__(self, *args, intents = Intents.all(), **kwargs):
         super().__init__(*args, intents = intents, **kwargs)
 
-    ipc: Server | None = None
+    ipc: "Server | None" = None
     config: Config
     session = ClientSession()
 
@@ -10,6 +10,7 @@ from discord.ext.ipc.server import Server
 
 from akatsuki_du_ca import AkatsukiDuCa
 from config import config
+from modules import metrics
 from modules.log import logger
 
 
@@ -55,6 +56,14 @@ class Routes(Cog):
 
         return "lol"
 
+    @Server.route("/metrics")
+    async def get_metrics(self, _: ClientPayload) -> str:
+        """
+        Get the runtime counters of the bot
+        """
+
+        return dumps(metrics.collect())
+
     @Server.route("/")
     async def alive(self, *_) -> str:
         """
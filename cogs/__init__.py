@@ -1,39 +1,116 @@
+import asyncio
+import tracemalloc
+from dataclasses import dataclass
+from importlib import import_module
+
+from discord.ext.commands import Cog
+
 from akatsuki_du_ca import AkatsukiDuCa
-from cogs.admin import BotAdminCog, PrefixCog
-from cogs.fun import FunCog, GIFCog
-from cogs.legacy_commands import LegacyCommands
-from cogs.music import MusicCog, RadioMusic
-from cogs.nsfw import NSFWCog
-from cogs.toys import ToysCog
-from cogs.utils import MinecraftCog, UtilsCog
+from config import config
+from modules import importtime
 from modules.log import logger
 
-COGS_LIST = (
-    FunCog,
-    GIFCog,
-    RadioMusic,
-    MusicCog,
-    NSFWCog,
-    ToysCog,
-    UtilsCog,
-    MinecraftCog,
-    PrefixCog,
-    BotAdminCog,
-    LegacyCommands,
-)
+# cog class -> module defining it, only modules of enabled cogs are imported
+COGS = {
+    "FunCog": "cogs.fun",
+    "GIFCog": "cogs.fun",
+    "RadioMusic": "cogs.music",
+    "MusicCog": "cogs.music",
+    "NSFWCog": "cogs.nsfw",
+    "ToysCog": "cogs.toys",
+    "UtilsCog": "cogs.utils",
+    "OsuCog": "cogs.utils",
+    "MinecraftCog": "cogs.utils",
+    "PrefixCog": "cogs.admin",
+    "BotAdminCog": "cogs.admin",
+    "LegacyCommands": "cogs.legacy_commands",
+}
 
 
-async def setup(bot: AkatsukiDuCa):
-    for cog in COGS_LIST:
-        await bot.add_cog(cog(bot))
+@dataclass
+class ModuleCost:
+    """
+    What importing a cog module cost
+    """
+
+    cogs: list[str]
+    seconds: float
+    # bytes still allocated by the import, if memory is traced
+    memory: int | None
+
+
+global costs, loaded
+costs: dict[str, ModuleCost] = {}
+loaded: list[type[Cog]] = []
+
+
+def enabled_cogs() -> list[str]:
+    for name in config.features.cogs or []:
+        assert name in COGS, f"unknown cog {name}"
+    return [name for name in COGS if config.features.enabled(name)]
+
+
+def import_cogs() -> list[type[Cog]]:
+    """
+    Import the modules of the enabled cogs, measuring each one
 
-    await MusicCog.connect_nodes(bot)
+    Times come from modules.importtime. Memory is only traced with
+    features.trace_memory, tracing makes imports several times slower.
+    Modules shared by several cogs count towards the first one importing
+    them.
+    """
+
+    costs.clear()
+    loaded.clear()
+    for name in enabled_cogs():
+        module_name = COGS[name]
+        if module_name not in costs:
+            tracing = config.features.trace_memory
+            # someone else may be tracing already, leave it running then
+            started = tracing and not tracemalloc.is_tracing()
+            if started:
+                tracemalloc.start()
+            before = tracemalloc.get_traced_memory()[0]
+            mark = importtime.mark()
+
+            import_module(module_name)
+
+            memory = None
+            if tracing:
+                memory = tracemalloc.get_traced_memory()[0] - before
+            if started:
+                tracemalloc.stop()
+            seconds = importtime.cumulative(module_name, mark)
+            costs[module_name] = ModuleCost([], seconds, memory)
+
+        costs[module_name].cogs.append(name)
+        loaded.append(getattr(import_module(module_name), name))
+    return loaded
+
+
+def log_costs() -> None:
+    lines = []
+    for module, cost in costs.items():
+        memory = ""
+        if cost.memory is not None:
+            memory = f"{cost.memory / 2**20:6.1f}MiB  "
+        lines.append(
+            f"  {module:<22} {cost.seconds * 1000:6.0f}ms  {memory}" +
+            ", ".join(cost.cogs)
+        )
+    logger.info("Cog modules loaded:\n" + "\n".join(lines))
+
+
+async def setup(bot: AkatsukiDuCa):
+    # Lavalink nodes are connected by main.setup_hook, alongside this
+    await asyncio.gather(*(bot.add_cog(cog(bot)) for cog in import_cogs()))
 
     logger.info("Cogs loaded")
+    log_costs()
 
 
 async def teardown(bot: AkatsukiDuCa):
-    for cog in COGS_LIST:
-        await bot.remove_cog(cog.__name__)
+    for cog in loaded:
+        await bot.remove_cog(cog.__cog_name__)
 
     logger.info("Cogs unloaded")
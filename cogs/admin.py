@@ -84,7 +84,7 @@ class BotAdminCog(Cog):
         Reset a guild prefix
         """
 
-        if not await check_owners(ctx):
+        if not check_owners(ctx):
             raise MissingPermissions(["manage_guild"])
 
         await delete_prefix(guild_id)
@@ -15,7 +15,7 @@ from config import config
 from modules.database import get_user_lang
 from modules.exceptions import LangNotAvailable
 from modules.gif import get_gif_url
-from modules.lang import get_lang
+from modules.lang import get_lang, locale_to_lang
 from modules.log import logger
 from modules.misc import GuildTextableChannel, rich_embed, user_cooldown_check
 from modules.quote import get_quote
@@ -38,7 +38,7 @@ class GIFCog(GroupCog, name = "gif"):
                 "etou...", ephemeral = True
             )
 
-        lang = await get_lang(interaction.user.id)
+        lang = await get_lang(interaction.user.id, interaction.locale)
         action = interaction.command.name
 
         await interaction.channel.send(
@@ -167,7 +167,9 @@ class FunCog(Cog):
         Send an alarm >:)
         """
 
-        lang_option = await get_user_lang(interaction.user.id)
+        lang_option = await get_user_lang(
+            interaction.user.id, locale_to_lang(interaction.locale)
+        )
         if lang_option != "vi-vn":
             raise LangNotAvailable
 
@@ -197,7 +199,7 @@ class FunCog(Cog):
         """
         Wan sum waifu?
         """
-        lang = await get_lang(interaction.user.id)
+        lang = await get_lang(interaction.user.id, interaction.locale)
 
         image = await random_image()
 
@@ -224,7 +226,7 @@ class FunCog(Cog):
         for _ in range(0, 23):
             code += choice(ascii_letters)
 
-        lang = await get_lang(interaction.user.id)
+        lang = await get_lang(interaction.user.id, interaction.locale)
 
         await interaction.response.send_message(
             lang("fun.free_nitro.success"), ephemeral = True
@@ -260,7 +262,7 @@ class FunCog(Cog):
             embed = rich_embed(
                 Embed(title = quote.author, description = quote.quote),
                 interaction.user,
-                await get_lang(interaction.user.id),
+                await get_lang(interaction.user.id, interaction.locale),
             ),
             ephemeral = True,
         )
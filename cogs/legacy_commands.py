@@ -35,7 +35,7 @@ class LegacyCommands(Cog):
         Basically echo
         """
 
-        if not await check_owners(ctx):
+        if not check_owners(ctx):
             raise NotOwner
         if value == "":
             raise MissingRequiredArgument # type: ignore
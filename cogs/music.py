@@ -20,6 +20,7 @@ from models.music_embeds import (
 )
 from models.music_player import Player
 from modules import wavelink_helpers
+from modules.context import InteractionContext
 from modules.exceptions import MusicException
 from modules.lang import get_lang
 from modules.log import logger
@@ -62,7 +63,7 @@ class RadioMusic(GroupCog, name = "radio"):
             f"User ID: {interaction.user.id}, Guild ID: {interaction.guild_id}"
         )
 
-        lang = await get_lang(interaction.user.id)
+        lang = await get_lang(interaction.user.id, interaction.locale)
 
         await interaction.response.send_message(lang("music.suggestion_sent"))
 
@@ -134,6 +135,7 @@ class MusicCog(Cog):
         if len(player.queue) == 0:
             if player.end_behavior == "disconnect":
                 player.dj, player.text_channel = None, None
+                player.dj_locale = None
                 return await player.disconnect()
 
         await player.play(await player.queue.get_wait())
@@ -149,7 +151,7 @@ class MusicCog(Cog):
         assert isinstance(player, Player)
 
         assert player.dj
-        lang = await get_lang(player.dj.id)
+        lang = await get_lang(player.dj.id, player.dj_locale)
 
         embed = NewTrackEmbed(track, lang)
         embed.title = lang("music.misc.now_playing")
@@ -174,9 +176,8 @@ class MusicCog(Cog):
         """
 
         return await wavelink_helpers.connect(
-            interaction,
-            await get_lang(interaction.user.id),
-            new_connection = True
+            await InteractionContext(interaction).resolve(),
+            new_connection = True,
         )
 
     @checks.cooldown(1, 1.5, key = user_cooldown_check)
@@ -188,7 +189,8 @@ class MusicCog(Cog):
         """
 
         return await wavelink_helpers.disconnect(
-            interaction, await get_lang(interaction.user.id)
+            interaction, await
+            get_lang(interaction.user.id, interaction.locale)
         )
 
     @checks.cooldown(1, 1.25, key = user_cooldown_check)
@@ -214,6 +216,7 @@ class MusicCog(Cog):
         assert isinstance(interaction.channel, GuildTextableChannel)
         assert isinstance(interaction.user, Member)
         player.dj, player.text_channel = interaction.user, interaction.channel
+        player.dj_locale = interaction.locale
         await interaction.edit_original_response(
             content = lang("music.misc.action.music.searching")
         )
@@ -253,6 +256,7 @@ class MusicCog(Cog):
         assert isinstance(interaction.channel, GuildTextableChannel)
         assert isinstance(interaction.user, Member)
         player.dj, player.text_channel = interaction.user, interaction.channel
+        player.dj_locale = interaction.locale
         await interaction.edit_original_response(
             content = lang("music.misc.action.music.searching")
         )
@@ -38,7 +38,7 @@ class NSFWCog(GroupCog, name = "nsfw"):
         Good nsfw art huh?
         """
 
-        lang = await get_lang(interaction.user.id)
+        lang = await get_lang(interaction.user.id, interaction.locale)
 
         assert isinstance(interaction.channel, GuildTextableChannel)
 
@@ -8,8 +8,8 @@ from discord.ext.commands import Cog, GroupCog
 from discord.ui import Select, View
 
 from akatsuki_du_ca import AkatsukiDuCa
-from cogs.music import Player
 from config import config
+from modules.context import InteractionContext
 from modules.database import set_user_lang
 from modules.lang import get_lang, lang_list
 from modules.log import logger
@@ -52,45 +52,6 @@ class UtilsCog(Cog):
         logger.info("Utilities Cog unloaded")
         return await super().cog_unload()
 
-    @checks.cooldown(1, 1, key = user_cooldown_check)
-    @command(name = "osu")
-    async def osu(self, interaction: Interaction, username: str):
-        """
-        Get osu! stats for a user
-        """
-
-        author = interaction.user
-
-        lang = await get_lang(author.id)
-
-        player = await get_player(username)
-        if not player:
-            return await interaction.response.send_message(
-                lang("utils.osu.player_not_found")
-            )
-
-        assert player.statistics
-
-        description = lang("utils.osu.stats.description") % (
-            player.statistics.pp,
-            player.statistics.global_rank,
-        )
-
-        embed = rich_embed(
-            Embed(
-                title = lang("utils.osu.stats.title") % player.username,
-                description = description,
-            ).set_thumbnail(url = player.avatar_url).set_author(
-                name = "osu! user data",
-                icon_url =
-                "https://upload.wikimedia.org/wikipedia/commons/thumb/1/1e/Osu%21_Logo_2016.svg/1024px-Osu%21_Logo_2016.svg.png",
-            ),
-            author,
-            lang,
-        )
-
-        return await interaction.response.send_message(embed = embed)
-
     @checks.cooldown(1, 2.5, key = user_cooldown_check)
     @command(name = "bugreport")
     async def bugreport(
@@ -100,7 +61,7 @@ class UtilsCog(Cog):
         Report a bug. Use wisely
         """
 
-        lang = await get_lang(interaction.user.id)
+        lang = await get_lang(interaction.user.id, interaction.locale)
 
         await interaction.response.send_message(
             lang("utils.bug_report.success")
@@ -125,7 +86,7 @@ class UtilsCog(Cog):
         Start an interactive language change session. hehe
         """
 
-        lang = await get_lang(interaction.user.id)
+        lang = await get_lang(interaction.user.id, interaction.locale)
 
         select_menu = ChangeLang(interaction.user)
 
@@ -155,12 +116,18 @@ class UtilsCog(Cog):
 
         response = f"\U0001f3d3 Pong! `{round(interaction.client.latency * 1000)}ms`"
 
-        voice_client = interaction.client.voice_clients
+        voice_client = (
+            interaction.guild.voice_client if interaction.guild else None
+        )
+
+        if voice_client:
+            # only the music cog connects, so wavelink is already imported
+            from models.music_player import Player
 
-        if interaction.guild and isinstance(voice_client, Player):
-            response += (
-                f"\n\U0001f3b5 Music latency: `{voice_client.ping}ms`"
-            )
+            if isinstance(voice_client, Player):
+                response += (
+                    f"\n\U0001f3b5 Music latency: `{voice_client.ping}ms`"
+                )
 
         await interaction.response.send_message(content = response)
 
@@ -191,7 +158,8 @@ class UtilsCog(Cog):
 
         await interaction.response.send_message(
             embed = rich_embed(
-                embed, interaction.user, await get_lang(interaction.user.id)
+                embed, interaction.user, await
+                get_lang(interaction.user.id, interaction.locale)
             )
         )
 
@@ -234,7 +202,8 @@ class UtilsCog(Cog):
 
         await interaction.response.send_message(
             embed = rich_embed(
-                embed, user, await get_lang(interaction.user.id)
+                embed, user, await
+                get_lang(interaction.user.id, interaction.locale)
             ),
             allowed_mentions = AllowedMentions(
                 everyone = False, users = False, roles = False
@@ -259,7 +228,7 @@ class UtilsCog(Cog):
 
         embed = rich_embed(
             Embed(title = "Avatar"), interaction.user, await
-            get_lang(interaction.user.id)
+            get_lang(interaction.user.id, interaction.locale)
         )
 
         embed.set_image(url = user.avatar.url if user.avatar else None)
@@ -278,7 +247,7 @@ class UtilsCog(Cog):
         embed = rich_embed(
             Embed(title = "Server Icon", ),
             interaction.user,
-            await get_lang(interaction.user.id),
+            await get_lang(interaction.user.id, interaction.locale),
         )
 
         embed.set_image(
@@ -288,6 +257,63 @@ class UtilsCog(Cog):
         await interaction.response.send_message(embed = embed)
 
 
+class OsuCog(Cog):
+    """
+    osu! commands, aiosu is imported on the first lookup.
+    """
+
+    def __init__(self, bot: AkatsukiDuCa) -> None:
+        self.bot = bot
+        super().__init__()
+
+    async def cog_load(self) -> None:
+        logger.info("osu! Cog loaded")
+        return await super().cog_load()
+
+    async def cog_unload(self) -> None:
+        logger.info("osu! Cog unloaded")
+        return await super().cog_unload()
+
+    @checks.cooldown(1, 1, key = user_cooldown_check)
+    @command(name = "osu")
+    async def osu(self, interaction: Interaction, username: str):
+        """
+        Get osu! stats for a user
+        """
+
+        author = interaction.user
+
+        lang = await get_lang(author.id, interaction.locale)
+
+        player = await get_player(username)
+        if not player:
+            return await interaction.response.send_message(
+                lang("utils.osu.player_not_found")
+            )
+
+        assert player.statistics
+
+        description = lang("utils.osu.stats.description") % (
+            player.statistics.pp,
+            player.statistics.global_rank,
+        )
+
+        embed = rich_embed(
+            Embed(
+                title = lang("utils.osu.stats.title") % player.username,
+                description = description,
+            ).set_thumbnail(url = player.avatar_url).set_author(
+                name = "osu! user data",
+                icon_url =
+                "https://upload.wikimedia.org/wikipedia/commons/thumb/1/1e/Osu%21_Logo_2016.svg/1024px-Osu%21_Logo_2016.svg.png",
+            ),
+            author,
+            lang,
+        )
+
+        return await interaction.response.send_message(embed = embed)
+
+
 class MinecraftCog(GroupCog, name = "minecraft"):
     """
     Minecraft related commands.
@@ -311,9 +337,10 @@ class MinecraftCog(GroupCog, name = "minecraft"):
         Find info about a Minecraft Java server
         """
 
-        lang = await get_lang(interaction.user.id)
-
-        await interaction.response.defer()
+        context = await InteractionContext(interaction).resolve(
+            interaction.response.defer()
+        )
+        lang = context.lang
 
         data = await get_minecraft_server(server_ip)
 
@@ -1,6 +1,6 @@
 from modules.vault import (
-    API, Bot, ChannelsConfig, Config, HomeGuild, LavalinkNode, Redis, OsuAPI,
-    TenorAPI
+    API, Bot, ChannelsConfig, Config, Features, HomeGuild, LavalinkNode, Redis,
+    OsuAPI, Storage, TenorAPI
 )
 
 config = Config(
@@ -18,5 +18,9 @@ config = Config(
     lavalink_nodes = [LavalinkNode(uri = "", password = "")],
     redis = Redis(
         host = "", port = 0, username = "", password = "", database = 0
-    )
+    ),
+    storage = Storage(backend = "redis"),
+    features = Features(
+        cogs = None, ipc = True, jishaku = True, trace_memory = False
+    ),
 )
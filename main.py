@@ -3,6 +3,12 @@
 Main bot file.
 """
 
+# before anything else, so every import is timed
+from modules import importtime
+
+importtime.install()
+
+# pylint: disable=wrong-import-position
 import asyncio
 import datetime
 import traceback
@@ -14,9 +20,13 @@ from discord.ext.commands import errors as commands_errors
 
 from akatsuki_du_ca import AkatsukiDuCa
 from config import config
-from modules import database, exceptions, lang, misc, osu
+from modules import database, exceptions, lang, metrics, misc, osu, startup
 from modules.log import logger
 
+# pylint: enable=wrong-import-position
+
+logger.info(importtime.report())
+
 bot = AkatsukiDuCa(
     command_prefix = misc.get_prefix_for_bot,
     activity = Game(name = "Hibiki Ban Mai"),
@@ -35,7 +45,7 @@ async def sync_command(ctx: Context):
     Sync commands to global.
     """
 
-    if not await misc.check_owners(ctx):
+    if not misc.check_owners(ctx):
         return
     await bot.tree.sync()
     await ctx.send("Synced!")
@@ -47,21 +57,30 @@ async def reload(ctx: Context):
     Reload bot.
     """
 
-    if not await misc.check_owners(ctx):
+    if not misc.check_owners(ctx):
         return
 
+    mark = importtime.mark()
     await bot.reload_extension("cogs")
-    await bot.reload_extension("api")
-    await bot.reload_extension("jishaku")
+    if config.features.ipc:
+        await bot.reload_extension("api")
+    if config.features.jishaku:
+        await bot.reload_extension("jishaku")
+    await lang.reload()
     await ctx.send("Reloaded!")
     logger.info("Reloaded by command!")
+    logger.info(importtime.report(mark))
 
 
 # ^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^ bot commands
 # -----------------------------------------------------
 # vvvvvvvvvvvvvvvvvvvvvvvvvvvvvvvvvvvvvvvvv assembling bot
 
-database.load(config.redis)
+database.load(config.redis, config.storage)
+if config.storage.snapshot_path:
+    database.load_snapshot(
+        config.storage.snapshot_path, config.storage.snapshot_max_age
+    )
 lang.load()
 misc.load()
 
@@ -84,6 +103,8 @@ async def on_message(message: Message):
     if message.author.bot:
         return
 
+    await startup.wait_ready(startup.MESSAGE_READY_TIMEOUT)
+
     assert bot.user
     if message.content == f"<@{bot.user.id}>":
         prefix = await misc.get_prefix_for_bot(bot, message)
@@ -92,6 +113,9 @@ async def on_message(message: Message):
                                  ))("main.exceptions.ping_for_prefix") % prefix
         )
 
+    if not misc.might_be_command(message):
+        return
+
     await bot.process_commands(message)
 
 
@@ -198,7 +222,7 @@ async def on_error(
         if isinstance(error.original, app_commands_errors.CommandNotFound):
             return
 
-        _lang = await lang.get_lang(interaction.user.id)
+        _lang = await lang.get_lang(interaction.user.id, interaction.locale)
 
         if isinstance(error.original, app_commands_errors.CommandOnCooldown):
             return await interaction.edit_original_response(
@@ -280,21 +304,63 @@ async def setup_hook():
     Run on startup (yes you can touch this).
     """
 
-    await bot.load_extension("cogs")
-    await bot.load_extension("api")
-    await bot.load_extension("jishaku")
-    logger.info("Loaded jishaku")
+    database.start_invalidation_listener()
+    if config.bot.watch_lang:
+        lang.start_watcher()
+    if config.bot.metrics_interval:
+        metrics.start_reporter(config.bot.metrics_interval)
+
+    async def connect_lavalink():
+        # runs after the cogs extension imported it, which accounts for it
+        from cogs.music import MusicCog
+
+        await MusicCog.connect_nodes(bot)
+
+    # disabled subsystems are never imported
+    background = {}
+    features = config.features
+    if features.enabled("RadioMusic") or features.enabled("MusicCog"):
+        background["lavalink"] = connect_lavalink()
+    if features.ipc:
+        background["ipc"] = bot.load_extension("api")
+    if features.enabled("OsuCog"):
+        background["osu"] = osu.load(config.api.osu.key)
+    if features.jishaku:
+        background["jishaku"] = bot.load_extension("jishaku")
+    background["caches"] = database.wait_for_caches(
+        startup.CACHE_WARMUP_TIMEOUT
+    )
+
+    # the gateway connects while these run, events wait for them
+    startup.start_background(background)
+    # commands must exist before the first event arrives
+    await startup.run({
+        "cogs": bot.load_extension("cogs"),
+        "owners": misc.load_owners(bot),
+    })
+
+
+async def interaction_check(_: Interaction) -> bool:
+    """
+    Hold interactions until startup finished, as long as Discord allows
+    """
 
-    await osu.load(config.api.osu.key)
+    await startup.wait_ready(startup.INTERACTION_READY_TIMEOUT)
+    return True
 
 
 setattr(bot, "setup_hook", setup_hook)
+setattr(bot.tree, "interaction_check", interaction_check)
 
 bot.run(config.bot.token)
 
 
 async def cleanup():
+    lang.stop_watcher()
+    metrics.stop_reporter()
     await bot.session.close()
+    if config.storage.snapshot_path:
+        database.save_snapshot(config.storage.snapshot_path)
     await database.cleanup()
 
 
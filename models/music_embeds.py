@@ -1,6 +1,5 @@
 from typing import Iterator, TypeAlias, cast
 
-import validators
 from discord import ButtonStyle, Embed, Interaction
 from discord.ui import Button, View, button
 from wavelink import Playable, Playlist, Queue
@@ -19,6 +18,8 @@ class NewTrackEmbed(Embed):
         track: Playable,
         lang: Lang,
     ) -> None:
+        import validators
+
         title = (
             f"**{track.title}**"
             if not hasattr(track, "uri") or not validators.url(track.uri) else
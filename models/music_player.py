@@ -1,6 +1,6 @@
 from typing import Literal
 
-from discord import Member
+from discord import Locale, Member
 from wavelink import Player as WavelinkPlayer
 
 from modules.misc import GuildTextableChannelType
@@ -12,5 +12,7 @@ class Player(WavelinkPlayer):
     """
 
     dj: Member | None = None
+    # the DJ's Discord locale, for users without a language override
+    dj_locale: Locale | None = None
     text_channel: GuildTextableChannelType | None = None
     end_behavior: Literal["disconnect"] | None = "disconnect"
@@ -0,0 +1,97 @@
+"""
+In-process caches for database lookups.
+"""
+
+from collections import OrderedDict
+from dataclasses import dataclass
+from time import monotonic
+from typing import Generic, Hashable, TypeVar
+
+K = TypeVar("K", bound = Hashable)
+V = TypeVar("V")
+
+
+@dataclass
+class CacheStats:
+    hits: int = 0
+    misses: int = 0
+    invalidations: int = 0
+    evictions: int = 0
+    # answered by a negative index without touching the cache
+    filtered: int = 0
+
+    @property
+    def hit_rate(self) -> float:
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+
+class LRUCache(Generic[K, V]):
+    """
+    Bounded least recently used cache with a time to live per entry
+    """
+
+    def __init__(self, max_size: int = 10000, ttl: float = 600) -> None:
+        self.max_size = max_size
+        self.ttl = ttl
+        self.stats = CacheStats()
+        self._entries: OrderedDict[K, tuple[float, V]] = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __contains__(self, key: K) -> bool:
+        entry = self._entries.get(key)
+        return entry is not None and entry[0] > monotonic()
+
+    def get(self, key: K) -> tuple[bool, V | None]:
+        """
+        Return whether the key was found and its value, counting the lookup
+        """
+
+        entry = self._entries.get(key)
+        if entry is None:
+            self.stats.misses += 1
+            return False, None
+
+        expires_at, value = entry
+        if expires_at <= monotonic():
+            # kept until replaced or pushed out, see stale()
+            self.stats.misses += 1
+            return False, None
+
+        self._entries.move_to_end(key)
+        self.stats.hits += 1
+        return True, value
+
+    def stale(self, key: K) -> tuple[bool, V | None]:
+        """
+        Return an entry even if it expired, for when it can't be refreshed
+        """
+
+        entry = self._entries.get(key)
+        if entry is None:
+            return False, None
+        return True, entry[1]
+
+    def set(self, key: K, value: V) -> None:
+        self._entries[key] = (monotonic() + self.ttl, value)
+        self._entries.move_to_end(key)
+
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last = False)
+            self.stats.evictions += 1
+
+    def items(self) -> list[tuple[K, V]]:
+        """
+        Return every entry, expired ones too, least recently used first
+        """
+
+        return [(key, value) for key, (_, value) in self._entries.items()]
+
+    def invalidate(self, key: K) -> None:
+        if self._entries.pop(key, None) is not None:
+            self.stats.invalidations += 1
+
+    def clear(self) -> None:
+        self._entries.clear()
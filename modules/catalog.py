@@ -0,0 +1,258 @@
+"""
+Compiled binary language catalog, shared between processes with mmap.
+
+Build it offline with `python -m modules.catalog` after editing lang/.
+
+Layout (little endian):
+    magic, version, header length, JSON header
+    string offsets: (strings + 1) x u32 into the blob
+    addresses: addresses x u32 string ids
+    per language: addresses x u32 value refs
+    blob: every distinct string once, UTF-8
+"""
+
+import json
+import mmap
+import os
+import struct
+from array import array
+from functools import lru_cache
+from types import MappingProxyType
+from typing import Any
+
+from modules.template import compile_template
+
+MAGIC = b"ADCC"
+VERSION = 1
+PREAMBLE = struct.Struct("<4sHI")
+
+# value ref = kind << KIND_SHIFT | string id
+KIND_SHIFT = 30
+KIND_STRING = 0
+KIND_DICT = 1 # JSON encoded subtree
+KIND_TUPLE = 2 # JSON encoded list
+ID_MASK = (1 << KIND_SHIFT) - 1
+
+
+class CatalogError(Exception):
+    """
+    Raised when a compiled catalog is missing, stale or corrupt.
+    """
+
+
+def compile_catalogs(
+    catalogs: dict[str, dict[str, Any]],
+    coverage: dict[str, float],
+    path: str,
+) -> None:
+    """
+    Write flat language catalogs into one binary catalog file
+    """
+
+    strings: dict[str, int] = {}
+
+    def intern(value: str) -> int:
+        if value not in strings:
+            strings[value] = len(strings)
+        return strings[value]
+
+    def ref(value: Any) -> int:
+        if isinstance(value, MappingProxyType):
+            return KIND_DICT << KIND_SHIFT | intern(
+                json.dumps(dict(value), ensure_ascii = False)
+            )
+        if isinstance(value, tuple):
+            return KIND_TUPLE << KIND_SHIFT | intern(
+                json.dumps(list(value), ensure_ascii = False)
+            )
+        return KIND_STRING << KIND_SHIFT | intern(value)
+
+    langs = list(catalogs)
+    addresses = sorted(
+        set().union(*(catalog.keys() for catalog in catalogs.values()))
+    )
+
+    address_ids = array("I", (intern(address) for address in addresses))
+    lang_tables = [
+        array(
+            "I",
+            (
+                ref(catalogs[lang][address])
+                if address in catalogs[lang] else ID_MASK
+                for address in addresses
+            ),
+        )
+        for lang in langs
+    ]
+
+    blob = bytearray()
+    offsets = array("I", [0])
+    for value in strings: # dicts keep insertion order = string id
+        blob += value.encode()
+        offsets.append(len(blob))
+
+    header = json.dumps({
+        "langs": langs,
+        "coverage": coverage,
+        "strings": len(strings),
+        "addresses": len(addresses),
+    }).encode()
+
+    # a half written file would look up to date, so replace it at once
+    temporary = f"{path}.tmp"
+    with open(temporary, "wb") as file:
+        file.write(PREAMBLE.pack(MAGIC, VERSION, len(header)))
+        file.write(header)
+        file.write(offsets.tobytes())
+        file.write(address_ids.tobytes())
+        for table in lang_tables:
+            file.write(table.tobytes())
+        file.write(blob)
+    os.replace(temporary, path)
+
+
+class CompiledCatalogs:
+    """
+    Memory mapped compiled catalog file
+    """
+
+    def __init__(self, path: str) -> None:
+        try:
+            with open(path, "rb") as file:
+                self._mmap = mmap.mmap(
+                    file.fileno(), 0, access = mmap.ACCESS_READ
+                )
+        except (OSError, ValueError) as error:
+            raise CatalogError(f"Can't map {path}: {error}") from error
+
+        try:
+            self._parse(path)
+        except (
+            struct.error,
+            ValueError, # bad JSON or UTF-8 too
+            TypeError,
+            KeyError,
+            IndexError,
+        ) as error:
+            raise CatalogError(f"{path} is corrupt: {error!r}") from error
+        self._value = lru_cache(maxsize = 4096)(self._decode)
+
+    def _parse(self, path: str) -> None:
+        magic, version, header_length = PREAMBLE.unpack_from(self._mmap)
+        if magic != MAGIC or version != VERSION:
+            raise CatalogError(f"{path} is not a version {VERSION} catalog")
+
+        position = PREAMBLE.size
+        header = json.loads(self._mmap[position:position + header_length])
+        position += header_length
+
+        self.langs: list[str] = header["langs"]
+        self.coverage: dict[str, float] = header["coverage"]
+
+        view = memoryview(self._mmap)
+        string_count = header["strings"]
+        address_count = header["addresses"]
+
+        def table(count: int) -> memoryview:
+            nonlocal position
+            if position + count * 4 > len(view):
+                raise CatalogError(f"{path} is truncated")
+            position += count * 4
+            return view[position - count * 4:position].cast("I")
+
+        self._offsets = table(string_count + 1)
+        address_ids = table(address_count)
+        self._tables: dict[str, memoryview] = {
+            lang: table(address_count)
+            for lang in self.langs
+        }
+
+        self._blob = position
+        if self._blob + self._offsets[-1] != len(view):
+            raise CatalogError(f"{path} is truncated")
+        if any(
+            start > end
+            for start, end in zip(self._offsets, self._offsets[1:])
+        ):
+            raise CatalogError(f"{path} has bad string offsets")
+        if any(address_id >= string_count for address_id in address_ids):
+            raise CatalogError(f"{path} has bad addresses")
+
+        def valid(value_ref: int) -> bool:
+            if value_ref == ID_MASK:
+                return True
+            kind, string_id = value_ref >> KIND_SHIFT, value_ref & ID_MASK
+            return kind <= KIND_TUPLE and string_id < string_count
+
+        for lang, refs in self._tables.items():
+            if not all(valid(value_ref) for value_ref in refs):
+                raise CatalogError(f"{path} has bad {lang} values")
+            # subtrees must parse, a ref of the wrong kind fails here
+            for value_ref in set(refs):
+                if value_ref >> KIND_SHIFT in (KIND_DICT, KIND_TUPLE):
+                    self._decode(value_ref)
+
+        # the only per process structure, address -> slot
+        self._slots = {
+            self._string(address_id): slot
+            for slot, address_id in enumerate(address_ids)
+        }
+
+    def _string(self, string_id: int) -> str:
+        start = self._blob + self._offsets[string_id]
+        end = self._blob + self._offsets[string_id + 1]
+        return str(self._mmap[start:end], "utf8")
+
+    def _decode(self, value_ref: int) -> Any:
+        kind, string_id = value_ref >> KIND_SHIFT, value_ref & ID_MASK
+        value = self._string(string_id)
+        if kind == KIND_DICT:
+            return MappingProxyType(json.loads(value))
+        if kind == KIND_TUPLE:
+            return tuple(json.loads(value))
+        return compile_template(value)
+
+    def lookup(self, lang: str, address: str) -> Any:
+        """
+        Return the value at an address, KeyError if it doesn't exist
+        """
+
+        value_ref = self._tables[lang][self._slots[address]]
+        if value_ref == ID_MASK:
+            raise KeyError(address)
+        return self._value(value_ref)
+
+    def catalog(self, lang: str) -> "MappedCatalog":
+        return MappedCatalog(self, lang)
+
+
+class MappedCatalog:
+    """
+    One language of a compiled catalog, looked up like the flat dict
+    """
+
+    def __init__(self, catalogs: CompiledCatalogs, lang: str) -> None:
+        self._catalogs = catalogs
+        self.lang = lang
+
+    def __getitem__(self, address: str) -> Any:
+        return self._catalogs.lookup(self.lang, address)
+
+    def __contains__(self, address: str) -> bool:
+        try:
+            self[address]
+        except KeyError:
+            return False
+        return True
+
+
+if __name__ == "__main__":
+    from modules import lang
+
+    lang.load(compiled = False)
+    compile_catalogs(
+        lang.lang_packs, # type: ignore
+        lang.coverage,
+        lang.COMPILED_CATALOG_PATH,
+    )
+    print(f"Compiled {len(lang.lang_packs)} languages")
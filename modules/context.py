@@ -0,0 +1,51 @@
+"""
+Per interaction dependencies, fetched while the response is sent.
+"""
+
+import asyncio
+from typing import Any, Awaitable
+
+from discord import Interaction
+
+from modules.lang import Lang, get_lang
+
+
+class InteractionContext:
+    """
+    Start the lookups a command needs as soon as the interaction arrives
+
+    Create it before the first response, pass that response to resolve()
+    and read the attributes.
+    """
+
+    lang: Lang
+
+    def __init__(self, interaction: Interaction) -> None:
+        self.interaction = interaction
+
+        self._lang = asyncio.ensure_future(
+            get_lang(interaction.user.id, interaction.locale)
+        )
+
+    async def resolve(
+        self, response: Awaitable[Any] | None = None
+    ) -> "InteractionContext":
+        """
+        Wait for the response sent meanwhile, then for the lookups
+
+        If either fails the lookups are cancelled, none is left unawaited.
+        """
+
+        try:
+            if response is not None:
+                await response
+            self.lang = await self._lang
+        except BaseException:
+            self.cancel()
+            raise
+        return self
+
+    def cancel(self) -> None:
+        if not self._lang.cancel() and not self._lang.cancelled():
+            # done already, mark a failure as retrieved
+            self._lang.exception()
@@ -2,43 +2,286 @@
 Database functions module.
 """
 
+import asyncio
 import json
-from typing import TypedDict
+from ast import literal_eval
+from time import perf_counter
+from typing import Any, Generic, TypedDict, TypeVar
+from uuid import uuid4
+
+import msgpack
+
+from modules.cache import CacheStats, LRUCache
+from modules.exceptions import InvalidRecord, StorageUnavailable
+from modules.log import logger
+from modules.resilience import ResilientBackend
+from modules.sharding import ShardedRedisBackend
+from modules.snapshot import SnapshotError, read_snapshot, write_snapshot
+from modules.storage import TABLES, RedisBackend, StorageBackend, make_backend
+from modules.writebehind import WriteBehindBackend
+from modules.vault import Redis as RedisConfig
+from modules.vault import Storage as StorageConfig
 
-from redis.asyncio import ConnectionPool, Redis
+global backend
+backend: StorageBackend
 
-from modules.vault import Redis as RedisConfig
+R = TypeVar("R")
+B = TypeVar("B", bound = StorageBackend)
 
-global redis
-redis: Redis
+INVALIDATION_CHANNEL = "akatsuki_du_ca:invalidate"
+# IDs checked per round trip when refreshing caches
+REFRESH_BATCH = 1000
+# set after the first refresh, the caches are warm from then on
+caches_ready = asyncio.Event()
+instance_id = uuid4().hex
 
+global invalidation_listener
+invalidation_listener: asyncio.Task | None = None
 
-def load(config: RedisConfig = RedisConfig()):
+
+def load(
+    config: RedisConfig = RedisConfig(),
+    storage: StorageConfig = StorageConfig()
+):
     """
-    Create and return a Redis instance
+    Create the storage backend chosen in the config
     """
 
-    pool: ConnectionPool = ConnectionPool.from_url(
-        f"redis://{'' if not config.username and not config.password else f'{config.username}:{config.password}@'}{config.host}:{config.port}/{config.database}",
-        max_connections = 5,
-    )
-    global redis
-    redis = Redis(connection_pool = pool)
+    global backend
+    backend = make_backend(storage, config)
+    if storage.resilient and storage.backend != "memory":
+        backend = ResilientBackend(backend, storage)
+    # on top, so flushed batches still get timeouts and the replay queue
+    if storage.write_behind:
+        backend = WriteBehindBackend(backend, storage)
+    logger.info(f"Using {backend.name} storage")
+
+
+def find_backend(kind: type[B]) -> B | None:
+    """
+    Return the layer of the storage backend of a type, if it's used
+    """
+
+    layer: StorageBackend | None = backend
+    while layer is not None:
+        if isinstance(layer, kind):
+            return layer
+        layer = getattr(layer, "inner", None)
+    return None
+
+
+def pool_metrics() -> dict[str, float]:
+    """
+    Return a snapshot of the Redis connection pool usage
+    """
+
+    redis = find_backend(RedisBackend)
+    return redis.pool.metrics() if redis else {}
+
+
+def endpoint_metrics() -> dict[str, dict[str, float]]:
+    """
+    Return the latency of the Redis primary and every replica
+    """
+
+    redis = find_backend(RedisBackend)
+    return redis.endpoint_metrics() if redis else {}
+
+
+def shard_metrics() -> dict[str, dict[str, float]]:
+    """
+    Return the connection pool usage of every Redis shard
+    """
+
+    sharded = find_backend(ShardedRedisBackend)
+    return sharded.node_metrics() if sharded else {}
+
+
+def resilience_metrics() -> dict[str, float | str]:
+    """
+    Return the circuit breaker state and replay queue size
+    """
+
+    resilient = find_backend(ResilientBackend)
+    return resilient.metrics() if resilient else {}
+
+
+def write_behind_metrics() -> dict[str, int]:
+    """
+    Return how many buffered writes were coalesced and flushed
+    """
+
+    write_behind = find_backend(WriteBehindBackend)
+    return write_behind.metrics() if write_behind else {}
 
 
 async def cleanup():
-    await redis.close()
+    global invalidation_listener
+    if invalidation_listener:
+        invalidation_listener.cancel()
+        invalidation_listener = None
+
+    await backend.close()
+
+
+# ------------------------------------------ invalidation ------------------------------------------
+
+
+async def publish_invalidation(kind: str, key: int) -> None:
+    """
+    Tell every other bot process to drop a cached entry
+    """
+
+    await backend.publish(INVALIDATION_CHANNEL, f"{instance_id}:{kind}:{key}")
+
+
+async def handle_invalidation(kind: str, key: int) -> None:
+    """
+    Drop a cached entry because another process changed it
+    """
+
+    # the next lookup must not hit a replica that hasn't seen the write yet
+    backend.note_write(kind, key)
+
+    if kind == "prefix":
+        prefix_cache.pop(key, None)
+        # might be a set or a delete, next lookup finds out
+        custom_prefix_guilds.add(key)
+        prefix_cache_stats.invalidations += 1
+
+    if kind == "user_lang":
+        user_lang_cache.invalidate(key)
+        lang_override_users.add(key)
+
+    if kind == "op":
+        await refresh_op(key)
+
+
+async def _listen_for_invalidations() -> None:
+    while True:
+        try:
+            async for message in backend.subscribe(INVALIDATION_CHANNEL):
+                if message is None:
+                    # we might have missed messages while disconnected, or
+                    # the caches came from a snapshot
+                    await refresh_caches()
+                    continue
+
+                sender, kind, key = message.split(":")
+                if sender == instance_id:
+                    continue
+
+                await handle_invalidation(kind, int(key))
+        except backend.connection_errors as error:
+            # caches are kept as a fallback and refreshed on reconnect
+            logger.warning(f"Lost cache invalidation channel: {error}")
+            await asyncio.sleep(1)
+
+
+async def refresh_caches() -> None:
+    """
+    Reload the indexes and check every cached entry against storage
+    """
+
+    await load_prefix_index()
+    await load_user_lang_index()
+    await load_op_index()
+
+    stale = { "prefix": 0, "user_lang": 0 }
+    prefix_ids = list(prefix_cache)
+    for start in range(0, len(prefix_ids), REFRESH_BATCH):
+        ids = prefix_ids[start:start + REFRESH_BATCH]
+        cached = [prefix_cache.get(server_id) for server_id in ids]
+        results = await backend.get_many("prefix", ids)
+        for server_id, old, result in zip(ids, cached, results):
+            prefix = result.decode() if result is not None else None
+            # unless set_prefix changed it while we were waiting
+            if prefix != old and prefix_cache.get(server_id) == old:
+                prefix_cache[server_id] = prefix
+                stale["prefix"] += 1
+
+    user_lang_entries = user_lang_cache.items()
+    for start in range(0, len(user_lang_entries), REFRESH_BATCH):
+        rows = user_lang_entries[start:start + REFRESH_BATCH]
+        results = await backend.get_many(
+            "user_lang", [user_id for user_id, _ in rows]
+        )
+        for (user_id, old), result in zip(rows, results):
+            lang_option = result.decode() if result is not None else None
+            if lang_option != old and user_lang_cache.stale(user_id)[1] == old:
+                user_lang_cache.set(user_id, lang_option)
+                stale["user_lang"] += 1
+
+    checked = {
+        "prefix": len(prefix_ids),
+        "user_lang": len(user_lang_entries)
+    }
+    for name in ("prefix", "user_lang"):
+        if name in warm_stats and "stale" not in warm_stats[name]:
+            warm_stats[name]["stale"] = stale[name]
+    summary = ", ".join(
+        f"{name} {stale[name]}/{checked[name]} stale" for name in stale
+    )
+    logger.info(f"Refreshed caches: {summary}")
+    caches_ready.set()
+
+
+async def wait_for_caches(timeout: float) -> None:
+    """
+    Wait for the first cache refresh after connecting to storage
+    """
+
+    await asyncio.wait_for(caches_ready.wait(), timeout)
+
+
+def start_invalidation_listener() -> None:
+    """
+    Start listening for cache invalidations from other processes
+    """
+
+    global invalidation_listener
+    if invalidation_listener and not invalidation_listener.done():
+        return
+
+    invalidation_listener = asyncio.create_task(_listen_for_invalidations())
 
 
 # --------------------------------------------- prefix ---------------------------------------------
 
+# None is cached too, most guilds never set a prefix
+prefix_cache: dict[int, str | None] = {}
+prefix_cache_stats = CacheStats()
+
+# guilds that might have a custom prefix, only trusted once loaded
+global custom_prefix_guilds, prefix_index_loaded
+custom_prefix_guilds: set[int] = set()
+prefix_index_loaded = False
+
+
+async def load_prefix_index() -> None:
+    """
+    Stream every guild with a custom prefix into the negative lookup index
+    """
+
+    global custom_prefix_guilds, prefix_index_loaded
+
+    guilds = await backend.scan_ids("prefix")
+
+    # keep guilds added by set_prefix while we were scanning
+    custom_prefix_guilds = guilds | custom_prefix_guilds
+    prefix_index_loaded = True
+    logger.info(f"Loaded {len(guilds)} guilds with custom prefix")
+
 
 async def set_prefix(server_id: int, prefix: str) -> None:
     """
     Set a user prefix in database
     """
 
-    await redis.hset("prefix", str(server_id), prefix)
+    custom_prefix_guilds.add(server_id)
+    await backend.put("prefix", server_id, prefix.encode())
+    prefix_cache[server_id] = prefix
+    await publish_invalidation("prefix", server_id)
 
 
 async def delete_prefix(server_id: int) -> None:
@@ -46,7 +289,24 @@ async def delete_prefix(server_id: int) -> None:
     Delete a user prefix in database
     """
 
-    await redis.hdel("prefix", str(server_id))
+    await backend.delete("prefix", server_id)
+    custom_prefix_guilds.discard(server_id)
+    prefix_cache[server_id] = None
+    await publish_invalidation("prefix", server_id)
+
+
+def peek_prefix(server_id: int) -> tuple[bool, str | None]:
+    """
+    Return whether the prefix is known locally and the prefix, no I/O
+    """
+
+    if prefix_index_loaded and server_id not in custom_prefix_guilds:
+        return True, None
+
+    if server_id in prefix_cache:
+        return True, prefix_cache[server_id]
+
+    return False, None
 
 
 async def get_prefix(server_id: int) -> str | None:
@@ -54,10 +314,125 @@ async def get_prefix(server_id: int) -> str | None:
     Get a user prefix from database
     """
 
-    result = await redis.hget("prefix", str(server_id))
-    if result is not None:
-        return result.decode()
-    return None
+    if prefix_index_loaded and server_id not in custom_prefix_guilds:
+        prefix_cache_stats.filtered += 1
+        return None
+
+    if server_id in prefix_cache:
+        prefix_cache_stats.hits += 1
+        return prefix_cache[server_id]
+
+    prefix_cache_stats.misses += 1
+    try:
+        result = await backend.get("prefix", server_id)
+    except StorageUnavailable:
+        # the default prefix, not cached so it's fetched once storage is back
+        return None
+    prefix = result.decode() if result is not None else None
+    prefix_cache[server_id] = prefix
+    return prefix
+
+
+async def get_prefixes(server_ids: list[int]) -> list[str | None]:
+    """
+    Get many guild prefixes in one round trip, in input order
+    """
+
+    prefixes: dict[int, str | None] = {}
+    missing: list[int] = []
+    for server_id in dict.fromkeys(server_ids):
+        known, prefix = peek_prefix(server_id)
+        if known:
+            prefixes[server_id] = prefix
+        else:
+            missing.append(server_id)
+
+    prefix_cache_stats.misses += len(missing)
+    try:
+        results = await backend.get_many("prefix", missing)
+    except StorageUnavailable:
+        results = []
+        prefixes.update(dict.fromkeys(missing))
+
+    for server_id, result in zip(missing, results):
+        prefix = result.decode() if result is not None else None
+        prefix_cache[server_id] = prefix
+        prefixes[server_id] = prefix
+
+    return [prefixes[server_id] for server_id in server_ids]
+
+
+# -------------------------------------------- records --------------------------------------------
+
+# version -> ordered (field, type) pairs, the newest version is written
+Schemas = dict[int, tuple[tuple[str, type], ...]]
+
+
+class RecordCodec(Generic[R]):
+    """
+    Encode structured values as compact versioned msgpack arrays
+
+    Records written before the codec existed (Python repr or JSON of a
+    dict) are still decoded.
+    """
+
+    def __init__(self, name: str, schemas: Schemas) -> None:
+        self.name = name
+        self.schemas = schemas
+        self.version = max(schemas)
+
+    def encode(self, record: R) -> bytes:
+        values = [
+            record[field] # type: ignore
+            for field, _ in self.schemas[self.version]
+        ]
+        return msgpack.packb([self.version, *values])
+
+    def is_legacy(self, data: bytes) -> bool:
+        return data[:1] == b"{"
+
+    def decode(self, data: bytes) -> R:
+        if self.is_legacy(data):
+            return self._validate(self._decode_legacy(data))
+
+        try:
+            version, *values = msgpack.unpackb(data)
+            schema = self.schemas[version]
+        except (ValueError, TypeError, KeyError) as error:
+            raise InvalidRecord(f"Bad {self.name} record: {error}") from error
+
+        if len(values) != len(schema):
+            raise InvalidRecord(
+                f"{self.name} v{version} has {len(values)} fields, " +
+                f"expected {len(schema)}"
+            )
+        return self._validate(
+            dict(zip((field for field, _ in schema), values))
+        )
+
+    def _decode_legacy(self, data: bytes) -> dict:
+        text = data.decode()
+        try:
+            record = json.loads(text)
+        except ValueError:
+            try:
+                record = literal_eval(text)
+            except (ValueError, SyntaxError) as error:
+                raise InvalidRecord(
+                    f"Bad legacy {self.name} record: {error}"
+                ) from error
+
+        if not isinstance(record, dict):
+            raise InvalidRecord(f"Legacy {self.name} record isn't a dict")
+        return record
+
+    def _validate(self, record: dict) -> R:
+        for field, field_type in self.schemas[self.version]:
+            if not isinstance(record.get(field), field_type):
+                raise InvalidRecord(
+                    f"{self.name}.{field} isn't {field_type.__name__}"
+                )
+        return record # type: ignore
 
 
 # ------------------------------------------- op ----------------------------------------------
@@ -68,17 +443,97 @@ class OP(TypedDict):
     adder_id: int
 
 
+op_codec: RecordCodec[OP] = RecordCodec(
+    "op", { 1: (("reason", str), ("adder_id", int)) }
+)
+
+
+def _decode_op(op_id: int, result: bytes | None) -> OP | None:
+    if result is None:
+        return None
+
+    try:
+        return op_codec.decode(result)
+    except InvalidRecord as error:
+        logger.warning(f"Ignoring OP {op_id}: {error}")
+        return None
+
+
+# users allowed to run owner commands, kept exact through invalidation
+global op_ids, op_index_loaded, op_generation
+op_ids: set[int] = set()
+op_index_loaded = False
+# bumped on every OP change, a scan that overlapped one is redone
+op_generation = 0
+
+
+async def load_op_index() -> None:
+    """
+    Load every valid OP into the in-memory authorization set
+    """
+
+    global op_ids, op_index_loaded
+
+    while True:
+        generation = op_generation
+        ids = list(await backend.scan_ids("op"))
+        results = await backend.get_many("op", ids)
+        if generation == op_generation:
+            break
+
+    op_ids = {
+        op_id
+        for op_id, result in zip(ids, results)
+        if _decode_op(op_id, result)
+    }
+    op_index_loaded = True
+    logger.info(f"Loaded {len(op_ids)} OPs")
+
+
+async def refresh_op(op_id: int) -> None:
+    """
+    Re-read one OP after another process changed it
+    """
+
+    global op_generation
+    op_generation += 1
+
+    try:
+        op = _decode_op(op_id, await backend.get("op", op_id))
+    except StorageUnavailable:
+        op = None
+
+    if op:
+        op_ids.add(op_id)
+    else:
+        op_ids.discard(op_id)
+
+
+def is_op(user_id: int) -> bool:
+    """
+    Check the OP set, no I/O
+    """
+
+    return user_id in op_ids
+
+
 async def set_op(new_op_id: int, reason: str, adder_id: int) -> None:
     """
     Save the new OP Discord ID in database
     """
 
-    await redis.hset(
-        "op", str(new_op_id), str({
+    global op_generation
+
+    await backend.put(
+        "op", new_op_id,
+        op_codec.encode({
             "reason": reason,
             "adder_id": adder_id
         })
     )
+    op_ids.add(new_op_id)
+    op_generation += 1
+    await publish_invalidation("op", new_op_id)
 
 
 async def del_op(del_op_id: int) -> None:
@@ -86,7 +541,12 @@ async def del_op(del_op_id: int) -> None:
     Delete OP Discord ID from database
     """
 
-    await redis.hdel("op", str(del_op_id))
+    global op_generation
+
+    await backend.delete("op", del_op_id)
+    op_ids.discard(del_op_id)
+    op_generation += 1
+    await publish_invalidation("op", del_op_id)
 
 
 async def get_op(op_id: int) -> OP | None:
@@ -94,27 +554,295 @@ async def get_op(op_id: int) -> OP | None:
     Get all OP data from database
     """
 
-    result = await redis.hget("op", str(op_id))
-    if result is not None:
-        return json.loads(result.decode())
-    return None
+    try:
+        result = await backend.get("op", op_id)
+    except StorageUnavailable:
+        # nobody is OP while we can't check
+        return None
+    op = _decode_op(op_id, result)
+
+    if op and result and op_codec.is_legacy(result):
+        # rewrite old records as we meet them
+        await backend.put("op", op_id, op_codec.encode(op))
+
+    return op
+
+
+async def get_ops(user_ids: list[int]) -> list[OP | None]:
+    """
+    Get many OP entries in one round trip, in input order
+    """
+
+    try:
+        results = await backend.get_many("op", user_ids)
+    except StorageUnavailable:
+        return [None] * len(user_ids)
+
+    return [
+        _decode_op(op_id, result) for op_id, result in zip(user_ids, results)
+    ]
 
 
 # ------------------------------------------ user lang --------------------------------------------
 
+# None means the user never picked a language
+user_lang_cache = LRUCache[int, str | None](max_size = 10000, ttl = 600)
+
+# users who saved an explicit language, only trusted once loaded
+global lang_override_users, user_lang_index_loaded
+lang_override_users: set[int] = set()
+user_lang_index_loaded = False
+
+
+async def load_user_lang_index() -> None:
+    """
+    Stream every user with a saved language into the override index
+    """
+
+    global lang_override_users, user_lang_index_loaded
+
+    users = await backend.scan_ids("user_lang")
+
+    # keep users added by set_user_lang while we were scanning
+    lang_override_users = users | lang_override_users
+    user_lang_index_loaded = True
+    logger.info(f"Loaded {len(users)} users with language override")
+
 
 async def set_user_lang(user_id: int, lang_option: str) -> None:
     """
     Set a user language in database
     """
 
-    await redis.hset("user_lang", str(user_id), lang_option)
+    lang_override_users.add(user_id)
+    await backend.put("user_lang", user_id, lang_option.encode())
+    user_lang_cache.set(user_id, lang_option)
+    await publish_invalidation("user_lang", user_id)
 
 
-async def get_user_lang(user_id: int) -> str:
+async def get_user_lang(user_id: int, default: str = "en-us") -> str:
     """
     Get user language from database
+
+    Users without a saved language get the default (their Discord locale).
+    """
+
+    if user_lang_index_loaded and user_id not in lang_override_users:
+        user_lang_cache.stats.filtered += 1
+        return default
+
+    found, lang_option = user_lang_cache.get(user_id)
+    if not found:
+        try:
+            result = await backend.get("user_lang", user_id)
+        except StorageUnavailable:
+            # last known language, even if it expired
+            return user_lang_cache.stale(user_id)[1] or default
+
+        lang_option = result.decode() if result is not None else None
+        user_lang_cache.set(user_id, lang_option)
+
+    return lang_option or default
+
+
+async def get_user_langs(
+    user_ids: list[int],
+    default: str = "en-us",
+) -> list[str]:
+    """
+    Get many user languages in one round trip, in input order
+    """
+
+    lang_options: dict[int, str | None] = {}
+    missing: list[int] = []
+    for user_id in dict.fromkeys(user_ids):
+        if user_lang_index_loaded and user_id not in lang_override_users:
+            user_lang_cache.stats.filtered += 1
+            lang_options[user_id] = None
+            continue
+
+        found, lang_option = user_lang_cache.get(user_id)
+        if found:
+            lang_options[user_id] = lang_option
+        else:
+            missing.append(user_id)
+
+    try:
+        results = await backend.get_many("user_lang", missing)
+    except StorageUnavailable:
+        results = []
+        lang_options.update({
+            user_id: user_lang_cache.stale(user_id)[1]
+            for user_id in missing
+        })
+
+    for user_id, result in zip(missing, results):
+        lang_option = result.decode() if result is not None else None
+        user_lang_cache.set(user_id, lang_option)
+        lang_options[user_id] = lang_option
+
+    return [lang_options[user_id] or default for user_id in user_ids]
+
+
+# -------------------------------------------- snapshot --------------------------------------------
+
+# cache -> entries loaded from the snapshot and how many turned out stale
+warm_stats: dict[str, dict[str, float]] = {}
+
+
+def save_snapshot(path: str) -> None:
+    """
+    Dump the caches and indexes so the next start is warm
+    """
+
+    sections: dict[str, Any] = {
+        "prefix": list(prefix_cache.items()),
+        "prefix_index": None,
+        "user_lang": user_lang_cache.items(),
+        "user_lang_index": None,
+    }
+    if prefix_index_loaded:
+        sections["prefix_index"] = list(custom_prefix_guilds)
+    if user_lang_index_loaded:
+        sections["user_lang_index"] = list(lang_override_users)
+
+    size = write_snapshot(path, sections)
+    logger.info(f"Saved cache snapshot to {path} ({size} bytes)")
+
+
+def load_snapshot(path: str, max_age: float) -> None:
+    """
+    Warm the caches from a snapshot, checked against storage on connect
+    """
+
+    global custom_prefix_guilds, prefix_index_loaded
+    global lang_override_users, user_lang_index_loaded
+
+    try:
+        sections, age = read_snapshot(path, max_age)
+    except SnapshotError as error:
+        logger.info(f"Starting with cold caches: {error}")
+        return
+
+    for server_id, prefix in sections["prefix"]:
+        prefix_cache[server_id] = prefix
+    for user_id, lang_option in sections["user_lang"]:
+        user_lang_cache.set(user_id, lang_option)
+
+    if sections["prefix_index"] is not None:
+        custom_prefix_guilds = set(sections["prefix_index"])
+        prefix_index_loaded = True
+    if sections["user_lang_index"] is not None:
+        lang_override_users = set(sections["user_lang_index"])
+        user_lang_index_loaded = True
+    # OPs aren't restored, a revoked OP would keep its rights for as long
+    # as storage stays unreachable
+
+    entries = {
+        "prefix": len(prefix_cache),
+        "user_lang": len(user_lang_cache),
+        "prefix_index": len(sections["prefix_index"] or ()),
+        "user_lang_index": len(sections["user_lang_index"] or ()),
+    }
+    for name, count in entries.items():
+        warm_stats[name] = { "entries": count }
+    logger.info(
+        f"Warm start from a {age:.0f}s old snapshot: " + ", ".join(
+            f"{name} {stats['entries']:.0f}"
+            for name, stats in warm_stats.items()
+        )
+    )
+
+
+def warm_metrics() -> dict[str, dict[str, float]]:
+    """
+    Return how much of each cache the snapshot filled, and how much of it
+    was stale
     """
 
-    result = await redis.hget("user_lang", str(user_id))
-    return result.decode() if result is not None else "en-us"
+    return warm_stats
+
+
+# ------------------------------------------- benchmark --------------------------------------------
+
+
+async def benchmark_op_check(rounds: int = 10000) -> dict[str, float]:
+    """
+    Return the mean latency of a storage OP lookup and an OP set lookup
+    in microseconds
+
+    Looks up a made up user ID, so nothing is written.
+    """
+
+    user_id = 10**17
+    timings: dict[str, float] = {}
+
+    started = perf_counter()
+    for _ in range(rounds):
+        await get_op(user_id)
+    elapsed = perf_counter() - started
+    timings[f"get_op ({backend.name})"] = elapsed / rounds * 10**6
+
+    started = perf_counter()
+    for _ in range(rounds):
+        is_op(user_id)
+    elapsed = perf_counter() - started
+    timings["is_op"] = elapsed / rounds * 10**6
+
+    return timings
+
+
+async def benchmark_bulk_reads(
+    size: int = 100,
+    rounds: int = 100,
+) -> dict[str, float]:
+    """
+    Return the mean latency of looking up many IDs one by one and in one
+    bulk call, in milliseconds
+
+    Goes to storage like the bulk lookups do on cache misses. Looks up
+    made up IDs, so nothing is written.
+    """
+
+    ids = [10**17 + id for id in range(size)]
+    timings: dict[str, float] = {}
+
+    for table in TABLES:
+        started = perf_counter()
+        for _ in range(rounds):
+            for id in ids:
+                await backend.get(table, id)
+        elapsed = perf_counter() - started
+        timings[f"{table} x{size} looped ({backend.name})"] = (
+            elapsed / rounds * 1000
+        )
+
+        started = perf_counter()
+        for _ in range(rounds):
+            await backend.get_many(table, ids)
+        elapsed = perf_counter() - started
+        timings[f"{table} x{size} bulk ({backend.name})"] = (
+            elapsed / rounds * 1000
+        )
+
+    return timings
+
+
+async def main():
+    try:
+        from config import config
+        load(config.redis, config.storage)
+    except ImportError:
+        print("No config.py, using memory storage")
+        load(storage = StorageConfig(backend = "memory"))
+
+    for check, micros in (await benchmark_op_check()).items():
+        print(f"{check}: {micros:.2f}us")
+    for lookup, millis in (await benchmark_bulk_reads()).items():
+        print(f"{lookup}: {millis:.2f}ms")
+
+    await cleanup()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -61,6 +61,18 @@ class MusicException:
         """
 
 
+class InvalidRecord(Exception):
+    """
+    Raised when a stored record can't be decoded.
+    """
+
+
+class StorageUnavailable(Exception):
+    """
+    Raised when the settings storage is down or too slow to answer.
+    """
+
+
 class UnknownException(Exception):
     """
     Raised when the bot encounters an unknown error.
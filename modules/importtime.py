@@ -0,0 +1,87 @@
+"""
+Import time accounting, like `python -X importtime` but into the log.
+
+Install it before anything else is imported. It times every module that
+is actually loaded (cached imports cost nothing and aren't counted).
+"""
+
+import importlib._bootstrap as bootstrap # type: ignore
+import threading
+from time import perf_counter
+
+# (module, self seconds, cumulative seconds) in the order they finished
+records: list[tuple[str, float, float]] = []
+
+# private, typeshed doesn't know it
+_original_find_and_load = getattr(bootstrap, "_find_and_load")
+# time spent importing children of each import in progress, per thread
+_local = threading.local()
+
+
+def _timed_find_and_load(name, import_):
+    stack: list[float] = _local.__dict__.setdefault("stack", [])
+    stack.append(0.0)
+    started = perf_counter()
+    try:
+        return _original_find_and_load(name, import_)
+    finally:
+        cumulative = perf_counter() - started
+        children = stack.pop()
+        if stack:
+            stack[-1] += cumulative
+        records.append((name, cumulative - children, cumulative))
+
+
+def install() -> None:
+    setattr(bootstrap, "_find_and_load", _timed_find_and_load)
+
+
+def uninstall() -> None:
+    setattr(bootstrap, "_find_and_load", _original_find_and_load)
+
+
+def mark() -> int:
+    """
+    Return a position to report the imports made after it
+    """
+
+    return len(records)
+
+
+def cumulative(module: str, since: int = 0) -> float:
+    """
+    Return how long importing a module took, its own imports included
+    """
+
+    return max(
+        (total for name, _, total in records[since:] if name == module),
+        default = 0.0,
+    )
+
+
+def by_package(since: int = 0) -> dict[str, float]:
+    """
+    Return the self time of every top level package, slowest first
+    """
+
+    packages: dict[str, float] = {}
+    for name, own, _ in records[since:]:
+        package = name.split(".")[0]
+        packages[package] = packages.get(package, 0.0) + own
+    return dict(sorted(packages.items(), key = lambda item: -item[1]))
+
+
+def report(since: int = 0, limit: int = 10) -> str:
+    """
+    Summarize the imports made since a mark, for the log
+    """
+
+    packages = by_package(since)
+    modules = { name for name, _, _ in records[since:] }
+    return (
+        f"Imported {len(modules)} modules in " +
+        f"{sum(packages.values()) * 1000:.0f}ms, slowest: " + ", ".join(
+            f"{package} {seconds * 1000:.0f}ms"
+            for package, seconds in list(packages.items())[:limit]
+        )
+    )
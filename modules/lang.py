@@ -2,62 +2,387 @@
 Language stuff.
 """
 
+import asyncio
 import json
-from os import listdir
-from typing import Callable
+from os import listdir, path
+from time import perf_counter
+from types import MappingProxyType
+from typing import Any, Callable, Iterable, Mapping
 
+from discord import Locale
+
+from modules.catalog import CatalogError, CompiledCatalogs, MappedCatalog
 from modules.database import get_user_lang
+from modules.log import logger
+from modules.template import compile_template, placeholders
+
+COMPILED_CATALOG_PATH = "lang/catalog.bin"
 
-lang_packs: dict = {}
+# language -> flat catalog of every dotted address
+lang_packs: dict[str, dict[str, Any] | MappedCatalog] = {}
 lang_list = ["vi-vn", "en-us", "ja-jp"]
+# every pack is checked against this one on load
+reference_lang = "en-us"
+# language -> packs to take missing strings from, closest first
+fallback_chains: dict[str, list[str]] = {
+    "vi-vn": ["en-us"],
+    "ja-jp": ["en-us"],
+}
+# language -> share of the reference strings it translates itself
+coverage: dict[str, float] = {}
+# Discord locale language -> our language pack
+locale_langs = { "vi": "vi-vn", "ja": "ja-jp"}
+# one shared callable per language instead of a closure per call
+langs: dict[str, Callable[[str], str]] = {}
+
+# lang file -> last seen modification time / parsed content
+mtimes: dict[str, float] = {}
+sources: dict[str, dict] = {}
+reload_lock = asyncio.Lock()
+
+global watcher
+watcher: asyncio.Task | None = None
+
+
+def flatten(
+    node: Any,
+    address: str = "",
+    catalog: dict[str, Any] | None = None
+) -> dict[str, Any]:
+    """
+    Flatten a nested language pack into dotted address -> value
+
+    Dicts stay reachable as read-only views and lists become tuples, with
+    every item also addressable by its index. Strings with placeholders
+    become Templates.
+    """
+
+    if catalog is None:
+        catalog = {}
+
+    if isinstance(node, dict):
+        if address:
+            catalog[address] = MappingProxyType(node)
+        for key, child in node.items():
+            flatten(child, f"{address}.{key}" if address else key, catalog)
+    elif isinstance(node, list):
+        catalog[address] = tuple(node)
+        for index, child in enumerate(node):
+            flatten(child, f"{address}.{index}", catalog)
+    elif isinstance(node, str):
+        catalog[address] = compile_template(node)
+    else:
+        catalog[address] = node
+
+    return catalog
+
+
+def merge(base: dict, override: dict) -> dict:
+    """
+    Deep merge two nested language packs, override wins
+    """
+
+    merged = dict(base)
+    for key, value in override.items():
+        if isinstance(value, dict) and isinstance(merged.get(key), dict):
+            merged[key] = merge(merged[key], value)
+        else:
+            merged[key] = value
+    return merged
+
+
+def leaves(catalog: dict[str, Any]) -> set[str]:
+    """
+    Return the addresses of every final string in a catalog
+    """
+
+    return {
+        address
+        for address, value in catalog.items()
+        if not isinstance(value, (MappingProxyType, tuple))
+    }
+
+
+def source_files() -> list[str]:
+    """
+    Return every language JSON file
+    """
+
+    return [
+        f"lang/{lang}/{option}" for lang in lang_list
+        for option in listdir(f"lang/{lang}/")
+    ]
+
+
+def load_compiled() -> CompiledCatalogs:
+    """
+    Map the compiled catalog, if it is newer than every language file
+    """
+
+    if not path.exists(COMPILED_CATALOG_PATH):
+        raise CatalogError(f"{COMPILED_CATALOG_PATH} doesn't exist")
+
+    compiled_at = path.getmtime(COMPILED_CATALOG_PATH)
+    if any(path.getmtime(file) > compiled_at for file in source_files()):
+        raise CatalogError(f"{COMPILED_CATALOG_PATH} is older than lang/")
+
+    compiled = CompiledCatalogs(COMPILED_CATALOG_PATH)
+    if set(compiled.langs) != set(lang_list):
+        raise CatalogError(f"{COMPILED_CATALOG_PATH} has other languages")
+    return compiled
+
+
+def read_sources(files: Iterable[str]) -> dict[str, dict]:
+    """
+    Parse language files, blocking
+    """
+
+    sources = {}
+    for file_path in files:
+        with open(file_path, "r", encoding = "utf8") as file:
+            sources.update({ file_path: json.load(file) })
+    return sources
+
+
+def source_mtimes() -> dict[str, float]:
+    """
+    Return the modification time of every language file, blocking
+    """
+
+    return { file: path.getmtime(file) for file in source_files() }
+
+
+def build(
+    sources: dict[str, dict]
+) -> tuple[dict[str, dict[str, Any]], dict[str, float]]:
+    """
+    Build flat catalogs and coverage from parsed language files
+    """
 
+    raw_packs: dict[str, dict] = { lang: {} for lang in lang_list }
+    for file_path, content in sources.items():
+        _, lang, option = file_path.split("/")
+        raw_packs[lang].update({option.replace(".json", ""): content})
 
-def load() -> None:
+    reference = leaves(flatten(raw_packs[reference_lang]))
+    catalogs: dict[str, dict[str, Any]] = {}
+    new_coverage: dict[str, float] = {}
+
+    for lang, own_pack in raw_packs.items():
+        resolved: dict = {}
+        # last fallback first, so closer ones win
+        for fallback in reversed(fallback_chains.get(lang, [])):
+            resolved = merge(resolved, raw_packs[fallback])
+        catalogs.update({ lang: flatten(merge(resolved, own_pack)) })
+
+        own = leaves(flatten(own_pack)) & reference
+        new_coverage.update({ lang: len(own) / len(reference) })
+        logger.info(
+            f"Language {lang} covers {len(own)}/{len(reference)} strings " +
+            f"({new_coverage[lang]:.0%})"
+        )
+
+        missing = reference - leaves(catalogs[lang])
+        if missing:
+            logger.warning(
+                f"Language {lang} is missing {len(missing)} keys: " +
+                ", ".join(sorted(missing))
+            )
+
+    validate_templates(catalogs)
+
+    return catalogs, new_coverage
+
+
+def validate_templates(catalogs: dict[str, dict[str, Any]]) -> None:
+    """
+    Make every translation take as many arguments as the reference string
+
+    Mismatched translations are replaced by the reference string.
+    """
+
+    reference = catalogs[reference_lang]
+    for lang, catalog in catalogs.items():
+        for address, value in catalog.items():
+            if not isinstance(value, str) or address not in reference:
+                continue
+
+            found = placeholders(value)
+            expected = placeholders(reference[address])
+            if found != expected:
+                logger.warning(
+                    f"Language {lang} has {found} placeholders in " +
+                    f"{address}, expected {expected}"
+                )
+                catalog[address] = reference[address]
+
+
+def swap(
+    catalogs: Mapping[str, dict[str, Any] | MappedCatalog],
+    new_coverage: dict[str, float],
+) -> None:
+    """
+    Replace every catalog at once, never leaving them empty on the event loop
+    """
+
+    lang_packs.clear()
+    lang_packs.update(catalogs)
+    langs.clear()
+    langs.update({
+        lang: catalog.__getitem__
+        for lang, catalog in catalogs.items()
+    })
+    coverage.clear()
+    coverage.update(new_coverage)
+
+
+def load(compiled: bool = True) -> None:
     """
     Return all language pack
+
+    Uses the compiled catalog when it's up to date, see modules.catalog.
+    """
+
+    mtimes.clear()
+    mtimes.update(source_mtimes())
+
+    if compiled:
+        try:
+            catalogs = load_compiled()
+        except CatalogError as error:
+            logger.warning(f"Parsing language files instead: {error}")
+        else:
+            # parsed lazily by the first reload
+            sources.clear()
+            swap({ lang: catalogs.catalog(lang)
+                   for lang in lang_list }, catalogs.coverage)
+            logger.info(f"Mapped {COMPILED_CATALOG_PATH}")
+            return
+
+    sources.clear()
+    sources.update(read_sources(mtimes))
+    swap(*build(sources))
+
+
+def changed_files() -> list[str]:
+    """
+    Return language files changed since they were last loaded, blocking
+    """
+
+    current = source_mtimes()
+    return [
+        file for file, mtime in current.items() if mtimes.get(file) != mtime
+    ] + [file for file in mtimes if file not in current]
+
+
+async def reload(files: list[str] | None = None) -> list[str]:
+    """
+    Reparse changed language files off the event loop and swap them in
+
+    Returns the files that were reloaded.
     """
 
-    if lang_packs != {}:
-        lang_packs.clear()
+    async with reload_lock:
+        started = perf_counter()
+
+        def parse():
+            new_mtimes = source_mtimes()
+            changed = changed_files() if files is None else files
+            new_sources = {
+                file: content
+                for file, content in sources.items()
+                if file in new_mtimes
+            }
+            # files we never parsed because the compiled catalog was used
+            read = [
+                file for file in new_mtimes
+                if file in changed or file not in new_sources
+            ]
+            new_sources.update(read_sources(read))
+            # only files read are up to date, one changed since the watcher
+            # looked is picked up next time
+            seen = {
+                file: mtime
+                for file, mtime in mtimes.items()
+                if file in new_mtimes
+            }
+            seen.update({ file: new_mtimes[file] for file in read })
+            return changed, seen, new_sources, build(new_sources)
+
+        try:
+            changed, new_mtimes, new_sources, built = await asyncio.to_thread(
+                parse
+            )
+        except (OSError, ValueError) as error:
+            logger.warning(f"Keeping old language packs: {error}")
+            return []
+
+        stall_started = perf_counter()
+        mtimes.clear()
+        mtimes.update(new_mtimes)
+        sources.clear()
+        sources.update(new_sources)
+        swap(*built)
+        finished = perf_counter()
 
-    for lang in lang_list:
-        options = listdir(f"lang/{lang}/")
-        full_lang = {}
+        logger.info(
+            f"Reloaded {len(changed)} language files in " +
+            f"{(finished - started) * 1000:.1f}ms, event loop blocked for " +
+            f"{(finished - stall_started) * 1000:.2f}ms"
+        )
+        return changed
 
-        for option in options:
-            with open(f"lang/{lang}/{option}", "r", encoding = "utf8") as file:
-                full_lang.update({
-                    option.replace(".json", ""): json.load(file)
-                })
 
-        lang_packs.update({ lang: full_lang })
+async def _watch(interval: float) -> None:
+    while True:
+        await asyncio.sleep(interval)
 
+        try:
+            changed = await asyncio.to_thread(changed_files)
+        except OSError as error:
+            logger.warning(f"Can't check language files: {error}")
+            continue
 
-async def get_lang(user_id: int) -> Callable[[str], str]:
+        if changed:
+            await reload(changed)
+
+
+def start_watcher(interval: float = 2) -> None:
     """
-    Return a language pack based on user's language
+    Reload language files whenever they change
     """
 
-    user_lang_pack = lang_packs[await get_user_lang(user_id)]
+    global watcher
+    if watcher and not watcher.done():
+        return
+
+    watcher = asyncio.create_task(_watch(interval))
+
+
+def stop_watcher() -> None:
+    global watcher
+    if watcher:
+        watcher.cancel()
+        watcher = None
 
-    def get_lang_by_address(address: str) -> str:
-        """
-        Return a language string or a list of language strings
 
-        Address format: "child.child"
-        """
+def locale_to_lang(locale: Locale | None) -> str:
+    """
+    Return the language pack matching a Discord locale
+    """
+
+    if locale is None:
+        return "en-us"
+    return locale_langs.get(locale.value.split("-")[0], "en-us")
 
-        result_lang = user_lang_pack
-        for child in address.split("."):
-            try:
-                child = int(child) # type: ignore
-            except:
-                pass
-            result_lang = result_lang[child]
 
-        return result_lang
+async def get_lang(user_id: int,
+                   locale: Locale | None = None) -> Callable[[str], str]:
+    """
+    Return a language pack based on user's language
+    """
 
-    return get_lang_by_address
+    return langs[await get_user_lang(user_id, locale_to_lang(locale))]
 
 
 Lang = Callable[[str], str]
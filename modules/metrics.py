@@ -0,0 +1,69 @@
+"""
+Runtime counters of the bot, logged periodically and served over IPC.
+"""
+
+import asyncio
+from dataclasses import asdict
+from json import dumps
+from typing import Any
+
+from modules import database, misc
+from modules.cache import CacheStats
+from modules.log import logger
+
+global reporter
+reporter: asyncio.Task | None = None
+
+
+def _cache(stats: CacheStats, entries: int) -> dict[str, Any]:
+    return { **asdict(stats), "hit_rate": stats.hit_rate, "entries": entries }
+
+
+def collect() -> dict[str, Any]:
+    """
+    Return every counter, JSON serializable
+    """
+
+    prefix_cache = _cache(
+        database.prefix_cache_stats, len(database.prefix_cache)
+    )
+    user_lang_cache = _cache(
+        database.user_lang_cache.stats, len(database.user_lang_cache)
+    )
+
+    return {
+        "message_filter": asdict(misc.message_filter_stats),
+        "prefix_cache": prefix_cache,
+        "user_lang_cache": user_lang_cache,
+        "redis_pool": database.pool_metrics(),
+        "redis_endpoints": database.endpoint_metrics(),
+        "redis_shards": database.shard_metrics(),
+        "resilience": database.resilience_metrics(),
+        "write_behind": database.write_behind_metrics(),
+        "warm_start": database.warm_metrics(),
+    }
+
+
+async def _report(interval: float) -> None:
+    while True:
+        await asyncio.sleep(interval)
+        logger.info(f"Metrics: {dumps(collect())}")
+
+
+def start_reporter(interval: float) -> None:
+    """
+    Log the counters every interval seconds
+    """
+
+    global reporter
+    if reporter and not reporter.done():
+        return
+
+    reporter = asyncio.create_task(_report(interval))
+
+
+def stop_reporter() -> None:
+    global reporter
+    if reporter:
+        reporter.cancel()
+        reporter = None
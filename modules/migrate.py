@@ -0,0 +1,37 @@
+"""
+Move settings hashes into the bucketed layout without stopping the bot.
+
+Set `buckets` in the Redis config, deploy, then run
+`python -m modules.migrate`.
+"""
+
+import asyncio
+
+from config import config
+from modules.storage import RedisBackend
+
+SETTINGS_HASHES = ("prefix", "user_lang")
+
+
+def print_report(title: str, report: dict[str, dict[str, int]]) -> None:
+    print(title)
+    for layout, stats in report.items():
+        print(
+            f"  {layout}: " +
+            ", ".join(f"{key}={value}" for key, value in stats.items())
+        )
+
+
+async def main():
+    backend = RedisBackend(config.redis)
+
+    for name in SETTINGS_HASHES:
+        print_report(f"{name} before", await backend.memory_report(name))
+        await backend.migrate_to_buckets(name)
+        print_report(f"{name} after", await backend.memory_report(name))
+
+    await backend.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -2,6 +2,7 @@
 Just some checks and utils function
 """
 
+from dataclasses import dataclass
 from math import floor
 from random import choice
 from string import ascii_letters
@@ -14,11 +15,12 @@ from discord import (
 from discord.ext.commands import Context
 
 from akatsuki_du_ca import AkatsukiDuCa
-from modules.database import get_op, get_prefix
+from modules.database import get_prefix, is_op, peek_prefix
 from modules.lang import Lang
 
-global default_prefix
+global default_prefix, owner_ids
 default_prefix: str
+owner_ids: frozenset[int] = frozenset()
 
 
 def load(prefix: str = "duca!"):
@@ -26,23 +28,36 @@ def load(prefix: str = "duca!"):
     default_prefix = prefix
 
 
-async def check_owners(
-    ctx: Context[AkatsukiDuCa] | Interaction[AkatsukiDuCa]
-) -> bool:
+async def load_owners(bot: AkatsukiDuCa) -> None:
     """
-    Check if user is owner
+    Resolve the bot owners once, so owner checks never do I/O
     """
 
-    if isinstance(ctx, Interaction):
-        ctx = await Context.from_interaction(ctx)
+    global owner_ids
+
+    if bot.owner_ids:
+        owner_ids = frozenset(bot.owner_ids)
+    elif bot.owner_id:
+        owner_ids = frozenset([bot.owner_id])
+    else:
+        app = await bot.application_info()
+        if app.team:
+            owner_ids = frozenset(member.id for member in app.team.members)
+            bot.owner_ids = set(owner_ids)
+        else:
+            owner_ids = frozenset([app.owner.id])
+            bot.owner_id = app.owner.id
 
-    if await ctx.bot.is_owner(ctx.author):
-        return True
 
-    if await get_op(ctx.author.id):
-        return True
+def check_owners(
+    ctx: Context[AkatsukiDuCa] | Interaction[AkatsukiDuCa]
+) -> bool:
+    """
+    Check if user is owner or OP, in memory
+    """
 
-    return False
+    user = ctx.user if isinstance(ctx, Interaction) else ctx.author
+    return user.id in owner_ids or is_op(user.id)
 
 
 def user_cooldown_check(interaction: Interaction) -> int:
@@ -94,6 +109,40 @@ async def get_prefix_for_bot(_: AkatsukiDuCa, message: Message) -> str:
     return await get_prefix(message.guild.id) or default_prefix
 
 
+@dataclass
+class MessageFilterStats:
+    rejected: int = 0
+    passed: int = 0
+
+
+message_filter_stats = MessageFilterStats()
+
+
+def might_be_command(message: Message) -> bool:
+    """
+    Cheap check before resolving prefix and parsing a message.
+
+    Only rejects when the guild prefix is known locally.
+    """
+
+    content = message.content
+    if not content:
+        message_filter_stats.rejected += 1
+        return False
+
+    if not message.guild:
+        known, prefix = True, None
+    else:
+        known, prefix = peek_prefix(message.guild.id)
+
+    if known and not content.startswith(prefix or default_prefix):
+        message_filter_stats.rejected += 1
+        return False
+
+    message_filter_stats.passed += 1
+    return True
+
+
 def rich_embed(embed: Embed, author: User | Member, lang: Lang) -> Embed:
     """
     Added color, author and footer to embed
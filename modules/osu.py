@@ -1,15 +1,32 @@
+from typing import TYPE_CHECKING
+
 from aiohttp import ClientSession
-from aiosu.models import User as Player
-from aiosu.v1 import Client
 
-global client
-client: Client
+if TYPE_CHECKING:
+    from aiosu.models import User as Player
+    from aiosu.v1 import Client
+
+global token, client
+token: str | None = None
+client: "Client | None" = None
+
 
+async def load(osu_token: str):
+    """
+    Remember the token, aiosu is only imported on the first lookup
+    """
 
-async def load(token: str):
+    global token
+    token = osu_token
+
+
+async def get_player(username: str) -> "Player":
     global client
-    client = Client(token)
 
+    if not client:
+        from aiosu.v1 import Client
+
+        assert token, "osu! module not loaded"
+        client = Client(token)
 
-async def get_player(username: str) -> Player:
     return await client.get_user(username)
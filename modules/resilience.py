@@ -0,0 +1,335 @@
+"""
+Degraded mode for the storage backend.
+
+Every call gets a tight timeout and goes through a circuit breaker, so a
+stalled Redis fails fast instead of stalling every message. Writes that
+fail are queued and replayed once the backend answers again.
+"""
+
+import asyncio
+from collections import OrderedDict
+from dataclasses import dataclass
+from time import monotonic
+from typing import AsyncIterator, Awaitable, Callable, Literal, TypeVar
+
+from modules.exceptions import StorageUnavailable
+from modules.log import logger
+from modules.storage import StorageBackend
+from modules.vault import Storage as StorageConfig
+
+T = TypeVar("T")
+
+BreakerState = Literal["closed", "open", "half_open"]
+
+# marks a queued write that has been replaced or replayed meanwhile
+MISSING = object()
+
+
+class CircuitBreaker:
+    """
+    Stop calling a failing backend for a while, then let calls test it
+    """
+
+    def __init__(self, name: str, threshold: int, cooldown: float) -> None:
+        self.name = name
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self.state: BreakerState = "closed"
+        self.failures = 0
+        self.opened_at = 0.0
+        # state -> how many times the breaker moved into it
+        self.transitions: dict[BreakerState, int] = {
+            "closed": 0,
+            "open": 0,
+            "half_open": 0,
+        }
+
+    def _move(self, state: BreakerState) -> None:
+        message = f"{self.name} circuit breaker {self.state} -> {state}"
+        if state == "open":
+            logger.warning(message)
+        else:
+            logger.info(message)
+
+        self.state = state
+        self.transitions[state] += 1
+
+    def allow(self) -> bool:
+        """
+        Return whether a call may go through
+        """
+
+        if self.state != "open":
+            return True
+        if monotonic() - self.opened_at < self.cooldown:
+            return False
+
+        self._move("half_open")
+        return True
+
+    def record_success(self) -> bool:
+        """
+        Count a successful call, return whether that closed the breaker
+        """
+
+        self.failures = 0
+        if self.state == "closed":
+            return False
+
+        self._move("closed")
+        return True
+
+    def record_failure(self) -> None:
+        self.failures += 1
+        if self.state == "half_open" or (
+            self.state == "closed" and self.failures >= self.threshold
+        ):
+            self.opened_at = monotonic()
+            self._move("open")
+
+
+@dataclass
+class ResilienceStats:
+    timeouts: int = 0
+    errors: int = 0
+    # calls refused without trying because the breaker was open
+    rejected: int = 0
+    queued: int = 0
+    dropped: int = 0
+    replayed: int = 0
+
+
+class ResilientBackend(StorageBackend):
+    """
+    Wrap a backend with timeouts, a circuit breaker and a write replay queue
+
+    Reads raise StorageUnavailable instead of hanging, callers fall back to
+    cached values or defaults. Writes never fail, they are queued instead.
+    """
+
+    def __init__(
+        self, inner: StorageBackend, config: StorageConfig = StorageConfig()
+    ) -> None:
+        self.inner = inner
+        self.name = inner.name
+        self.connection_errors = (*inner.connection_errors, StorageUnavailable)
+
+        self.breaker = CircuitBreaker(
+            inner.name, config.breaker_threshold, config.breaker_cooldown
+        )
+        self.call_timeout = config.call_timeout
+        self.scan_timeout = config.scan_timeout
+        self.replay_limit = config.replay_limit
+        self.stats = ResilienceStats()
+
+        # (table, ID) -> value to write or None to delete, oldest first
+        self.pending: OrderedDict[tuple[str, int],
+                                  bytes | None] = OrderedDict()
+        # (channel, message) waiting for the writes before them
+        self.pending_messages: OrderedDict[tuple[str, str],
+                                           None] = OrderedDict()
+        self._replayer: asyncio.Task | None = None
+
+    async def _call(
+        self,
+        call: Callable[[], Awaitable[T]],
+        timeout: float | None = None
+    ) -> T:
+        if not self.breaker.allow():
+            self.stats.rejected += 1
+            raise StorageUnavailable(f"{self.name} circuit breaker is open")
+
+        try:
+            result = await asyncio.wait_for(
+                call(), timeout or self.call_timeout
+            )
+        except asyncio.TimeoutError as error:
+            self.stats.timeouts += 1
+            self.breaker.record_failure()
+            raise StorageUnavailable(f"{self.name} timed out") from error
+        except self.inner.connection_errors as error:
+            self.stats.errors += 1
+            self.breaker.record_failure()
+            raise StorageUnavailable(f"{self.name}: {error}") from error
+
+        if self.breaker.record_success():
+            self._start_replay()
+        return result
+
+    async def get(self, table: str, id: int) -> bytes | None:
+        if (table, id) in self.pending:
+            return self.pending[(table, id)]
+        return await self._call(lambda: self.inner.get(table, id))
+
+    async def get_many(self, table: str, ids: list[int]) -> list[bytes | None]:
+        results = await self._call(lambda: self.inner.get_many(table, ids))
+        if not self.pending:
+            return results
+
+        return [
+            self.pending.get((table, id), result)
+            for id, result in zip(ids, results)
+        ]
+
+    async def scan_ids(self, table: str) -> set[int]:
+        ids = await self._call(
+            lambda: self.inner.scan_ids(table), self.scan_timeout
+        )
+        for (pending_table, id), value in list(self.pending.items()):
+            if pending_table != table:
+                continue
+            if value is None:
+                ids.discard(id)
+            else:
+                ids.add(id)
+        return ids
+
+    async def put(self, table: str, id: int, value: bytes) -> None:
+        await self._write(table, id, value)
+
+    async def delete(self, table: str, id: int) -> None:
+        await self._write(table, id, None)
+
+    def _run_write(self, table: str, id: int,
+                   value: bytes | None) -> Callable[[], Awaitable[None]]:
+        if value is None:
+            return lambda: self.inner.delete(table, id)
+        return lambda: self.inner.put(table, id, value)
+
+    async def _write(self, table: str, id: int, value: bytes | None) -> None:
+        # an older write to the same ID is queued, keep them in order
+        if (table, id) in self.pending:
+            self._queue(table, id, value)
+            return
+
+        try:
+            await self._call(self._run_write(table, id, value))
+        except StorageUnavailable as error:
+            logger.warning(f"Queueing {table} {id} write: {error}")
+            self._queue(table, id, value)
+
+    async def write_many(
+        self, table: str, values: dict[int, bytes | None]
+    ) -> None:
+        ready: dict[int, bytes | None] = {}
+        for id, value in values.items():
+            if (table, id) in self.pending:
+                self._queue(table, id, value)
+            else:
+                ready[id] = value
+        if not ready:
+            return
+
+        try:
+            await self._call(lambda: self.inner.write_many(table, ready))
+        except StorageUnavailable as error:
+            logger.warning(f"Queueing {len(ready)} {table} writes: {error}")
+            for id, value in ready.items():
+                self._queue(table, id, value)
+
+    def _queue(self, table: str, id: int, value: bytes | None) -> None:
+        self.pending[(table, id)] = value
+        self.pending.move_to_end((table, id))
+        self.stats.queued += 1
+
+        while len(self.pending) > self.replay_limit:
+            (dropped_table, dropped_id), _ = self.pending.popitem(last = False)
+            self.stats.dropped += 1
+            logger.warning(
+                f"Replay queue is full, dropped {dropped_table} {dropped_id}"
+            )
+
+        self._start_replay()
+
+    async def publish(self, channel: str, message: str) -> None:
+        # other processes must not re-read before the queued writes land
+        if not self.pending and not self.pending_messages:
+            try:
+                await self._call(lambda: self.inner.publish(channel, message))
+                return
+            except StorageUnavailable:
+                pass
+
+        self.pending_messages[(channel, message)] = None
+        while len(self.pending_messages) > self.replay_limit:
+            self.pending_messages.popitem(last = False)
+            self.stats.dropped += 1
+        self._start_replay()
+
+    async def subscribe(self, channel: str) -> AsyncIterator[str | None]:
+        async for message in self.inner.subscribe(channel):
+            yield message
+
+    def note_write(self, table: str, id: int) -> None:
+        self.inner.note_write(table, id)
+
+    def _start_replay(self) -> None:
+        if not self.pending and not self.pending_messages:
+            return
+        if self._replayer and not self._replayer.done():
+            return
+
+        self._replayer = asyncio.create_task(self._replay())
+
+    async def _replay_once(self) -> None:
+        """
+        Write everything queued, oldest first, then the queued messages
+        """
+
+        while self.pending:
+            key, value = next(iter(self.pending.items()))
+            await self._call(self._run_write(*key, value))
+            # a newer write may have been queued while this one ran
+            if self.pending.get(key, MISSING) is value:
+                del self.pending[key]
+            self.stats.replayed += 1
+
+        while self.pending_messages:
+            channel, message = next(iter(self.pending_messages))
+            await self._call(lambda: self.inner.publish(channel, message))
+            self.pending_messages.pop((channel, message), None)
+
+    async def _replay(self) -> None:
+        while self.pending or self.pending_messages:
+            try:
+                await self._replay_once()
+            except StorageUnavailable:
+                await asyncio.sleep(self.breaker.cooldown)
+
+        logger.info(f"Replayed queued {self.name} writes")
+
+    def metrics(self) -> dict[str, float | str]:
+        """
+        Return a snapshot of the breaker and replay queue
+        """
+
+        return {
+            "state": self.breaker.state,
+            "failures": self.breaker.failures,
+            **{
+                f"transitions_{state}": count
+                for state, count in self.breaker.transitions.items()
+            },
+            "timeouts": self.stats.timeouts,
+            "errors": self.stats.errors,
+            "rejected": self.stats.rejected,
+            "queued": self.stats.queued,
+            "pending": len(self.pending) + len(self.pending_messages),
+            "dropped": self.stats.dropped,
+            "replayed": self.stats.replayed,
+        }
+
+    async def close(self) -> None:
+        if self._replayer:
+            self._replayer.cancel()
+            self._replayer = None
+
+        # last chance for writes queued during an outage
+        try:
+            await self._replay_once()
+        except StorageUnavailable as error:
+            logger.warning(
+                f"Lost {len(self.pending)} queued {self.name} writes: {error}"
+            )
+
+        await self.inner.close()
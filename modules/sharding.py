@@ -0,0 +1,400 @@
+"""
+Settings spread over several independent Redis nodes by consistent hashing.
+
+Keys are placed by hashing the whole key. With buckets that key is the
+bucket, the unit every bulk read works on, so each one lives on a single
+node.
+
+Changing the nodes without downtime:
+    1. migrate to buckets first, see modules.migrate
+    2. set `shards` to the new nodes and `previous_shards` to the old ones
+    3. deploy, reads fall back to the previous owner of a key
+    4. run `python -m modules.sharding reshard`
+    5. empty `previous_shards` and deploy again
+
+`python -m modules.sharding benchmark` compares throughput on 1..N nodes.
+"""
+
+import asyncio
+import sys
+from bisect import bisect
+from dataclasses import replace
+from hashlib import md5
+from random import choice
+from time import monotonic
+from typing import AsyncIterator, Callable
+
+from modules.log import logger
+from modules.storage import TABLES, RedisBackend, StorageBackend
+from modules.vault import Redis as RedisConfig
+from modules.vault import RedisShard
+
+# (table, ID) -> node name, or None to skip the ID
+Route = Callable[[str, int], str | None]
+
+# points per node on the ring, more spreads keys more evenly
+VIRTUAL_NODES = 160
+
+# deletes a moved field from its old node unless it changed meanwhile
+COMPARE_AND_DELETE_SCRIPT = """
+local deleted = 0
+for i = 1, #ARGV, 2 do
+    if redis.call("HGET", KEYS[1], ARGV[i]) == ARGV[i + 1] then
+        deleted = deleted + redis.call("HDEL", KEYS[1], ARGV[i])
+    end
+end
+return deleted
+"""
+
+
+def key_hash(key: str) -> int:
+    return int.from_bytes(md5(key.encode()).digest()[:8], "big")
+
+
+class HashRing:
+    """
+    Consistent hash ring, adding a node only moves the keys it takes over
+    """
+
+    def __init__(
+        self, nodes: list[str], virtual_nodes: int = VIRTUAL_NODES
+    ) -> None:
+        self.nodes = nodes
+        points = [(key_hash(f"{node}#{index}"), node)
+                  for node in nodes
+                  for index in range(virtual_nodes)]
+        points.sort()
+        self._hashes = [point for point, _ in points]
+        self._owners = [node for _, node in points]
+        # there are only tables x buckets distinct keys
+        self._cache: dict[str, str] = {}
+
+    def node(self, key: str) -> str:
+        if key not in self._cache:
+            index = bisect(self._hashes, key_hash(key))
+            self._cache[key] = self._owners[index % len(self._owners)]
+        return self._cache[key]
+
+
+def shard_name(shard: RedisShard) -> str:
+    return f"{shard.host}:{shard.port}"
+
+
+class ShardedRedisBackend(StorageBackend):
+    """
+    One RedisBackend per node, each ID routed by its bucket key
+    """
+
+    name = "sharded redis"
+    connection_errors = RedisBackend.connection_errors
+
+    def __init__(self, config: RedisConfig = RedisConfig()) -> None:
+        assert config.shards, "no shards configured"
+
+        # node name -> backend, old and new nodes share them
+        self.nodes: dict[str, RedisBackend] = {}
+        self.ring = HashRing(self._add_nodes(config, config.shards))
+        self.previous_ring = HashRing(
+            self._add_nodes(config, config.previous_shards)
+        ) if config.previous_shards else None
+
+        # every process must agree on it, so the first configured shard
+        self.primary = self.nodes[shard_name(config.shards[0])]
+
+        if not config.buckets:
+            logger.warning(
+                "Redis shards without buckets keep each table on one node"
+            )
+        logger.info(f"Sharding settings over {len(self.ring.nodes)} nodes")
+
+    def _add_nodes(self, config: RedisConfig,
+                   shards: list[RedisShard]) -> list[str]:
+        names = []
+        for shard in shards:
+            name = shard_name(shard)
+            if name not in self.nodes:
+                self.nodes[name] = RedisBackend(
+                    replace(
+                        config,
+                        host = shard.host,
+                        port = shard.port,
+                        replicas = shard.replicas,
+                        shards = [],
+                        previous_shards = [],
+                    )
+                )
+            names.append(name)
+        return names
+
+    def owner(self, table: str, id: int) -> str:
+        return self.ring.node(self.primary.bucket_key(table, id))
+
+    def previous_owner(self, table: str, id: int) -> str | None:
+        """
+        Return the node that held an ID before resharding, if it moved
+        """
+
+        if not self.previous_ring:
+            return None
+
+        previous = self.previous_ring.node(self.primary.bucket_key(table, id))
+        return previous if previous != self.owner(table, id) else None
+
+    def _group(self, table: str, ids: list[int],
+               route: Route) -> dict[str, list[int]]:
+        grouped: dict[str, list[int]] = {}
+        for id in ids:
+            node = route(table, id)
+            if node:
+                grouped.setdefault(node, []).append(id)
+        return grouped
+
+    async def _get_grouped(
+        self, table: str, grouped: dict[str, list[int]]
+    ) -> dict[int, bytes | None]:
+        replies = await asyncio.gather(
+            *(
+                self.nodes[node].get_many(table, ids)
+                for node, ids in grouped.items()
+            )
+        )
+
+        results: dict[int, bytes | None] = {}
+        for ids, reply in zip(grouped.values(), replies):
+            results.update(zip(ids, reply))
+        return results
+
+    async def get(self, table: str, id: int) -> bytes | None:
+        result = await self.nodes[self.owner(table, id)].get(table, id)
+
+        previous = self.previous_owner(table, id)
+        if result is None and previous:
+            result = await self.nodes[previous].get(table, id)
+        return result
+
+    async def get_many(self, table: str, ids: list[int]) -> list[bytes | None]:
+        if not ids:
+            return []
+
+        results = await self._get_grouped(
+            table, self._group(table, ids, self.owner)
+        )
+        if self.previous_ring:
+            missing = [id for id in ids if results[id] is None]
+            results.update(
+                await self._get_grouped(
+                    table, self._group(table, missing, self.previous_owner)
+                )
+            )
+        return [results[id] for id in ids]
+
+    async def put(self, table: str, id: int, value: bytes) -> None:
+        await self.write_many(table, { id: value })
+
+    async def delete(self, table: str, id: int) -> None:
+        await self.write_many(table, { id: None })
+
+    async def write_many(
+        self, table: str, values: dict[int, bytes | None]
+    ) -> None:
+        grouped = self._group(table, list(values), self.owner)
+        batches = {
+            node: {
+                id: values[id]
+                for id in ids
+            }
+            for node, ids in grouped.items()
+        }
+        await asyncio.gather(
+            *(
+                self.nodes[node].write_many(table, batch)
+                for node, batch in batches.items()
+            )
+        )
+
+        # after the new owner has it, so reads never miss in between
+        moved = self._group(table, list(values), self.previous_owner)
+        await asyncio.gather(
+            *(
+                self.nodes[node].write_many(table, dict.fromkeys(ids))
+                for node, ids in moved.items()
+            )
+        )
+
+    async def scan_ids(self, table: str) -> set[int]:
+        return set().union(
+            *await asyncio.gather(
+                *(node.scan_ids(table) for node in self.nodes.values())
+            )
+        )
+
+    async def publish(self, channel: str, message: str) -> None:
+        await self.primary.publish(channel, message)
+
+    async def subscribe(self, channel: str) -> AsyncIterator[str | None]:
+        async for message in self.primary.subscribe(channel):
+            yield message
+
+    def note_write(self, table: str, id: int) -> None:
+        self.nodes[self.owner(table, id)].note_write(table, id)
+
+    async def close(self) -> None:
+        for node in self.nodes.values():
+            await node.close()
+
+    def node_metrics(self) -> dict[str, dict[str, float]]:
+        """
+        Return the connection pool usage of every node
+        """
+
+        return {
+            name: node.pool.metrics()
+            for name, node in self.nodes.items()
+        }
+
+    def table_keys(self, table: str) -> str:
+        """
+        Return the pattern matching every key a table is stored in
+        """
+
+        if self.primary.bucketed(table):
+            return f"{table}:*"
+        return table
+
+    async def _move_fields(
+        self,
+        key: str,
+        fields: dict[bytes, bytes],
+        source: RedisBackend,
+        target: RedisBackend,
+    ) -> int:
+        async with target.redis.pipeline(transaction = False) as pipeline:
+            for field, value in fields.items():
+                pipeline.hsetnx(key, field, value)
+            created = await pipeline.execute()
+
+        # the bot may have deleted a field from both nodes after we read it
+        # and before our copy recreated it on the target
+        current = await source.redis.hmget(key, list(fields))
+        kept, undone = {}, {}
+        for item, was_created, now in zip(fields.items(), created, current):
+            field, value = item
+            if now == value:
+                kept[field] = value
+            elif was_created:
+                undone[field] = value
+
+        if undone:
+            await self._compare_and_delete(target, key, undone)
+        if not kept:
+            return 0
+        return await self._compare_and_delete(source, key, kept)
+
+    @staticmethod
+    async def _compare_and_delete(
+        node: RedisBackend, key: str, fields: dict[bytes, bytes]
+    ) -> int:
+        return await node.redis.register_script(COMPARE_AND_DELETE_SCRIPT)(
+            keys = [key],
+            args = [item for pair in fields.items() for item in pair],
+        )
+
+    async def reshard(self, table: str, batch_size: int = 500) -> int:
+        """
+        Move keys to the node owning them on the ring while the bot runs
+
+        Fields are copied without overwriting newer writes, then deleted
+        from the old node only if they didn't change meanwhile. A copy of a
+        field deleted meanwhile is deleted again. Returns how many fields
+        were moved.
+        """
+
+        moved = 0
+        for source_name, source in self.nodes.items():
+            async for raw_key in source.redis.scan_iter(
+                match = self.table_keys(table), count = 1000
+            ):
+                key = raw_key.decode()
+                target_name = self.ring.node(key)
+                if target_name == source_name:
+                    continue
+
+                target = self.nodes[target_name]
+                cursor = 0
+                while True:
+                    cursor, fields = await source.redis.hscan(
+                        key, cursor, count = batch_size
+                    )
+                    if fields:
+                        moved += await self._move_fields(
+                            key, fields, source, target
+                        )
+                    if cursor == 0:
+                        break
+
+        logger.info(f"Resharded {moved} {table} entries")
+        return moved
+
+
+# ------------------------------------------- benchmark --------------------------------------------
+
+
+async def benchmark(
+    config: RedisConfig,
+    nodes: int,
+    seconds: float = 5,
+    concurrency: int = 64,
+    ids: int = 10000,
+) -> float:
+    """
+    Return how many lookups per second a ring of the first nodes serves
+    """
+
+    backend = ShardedRedisBackend(
+        replace(
+            config,
+            shards = config.shards[:nodes],
+            previous_shards = [],
+            max_connections = concurrency,
+        )
+    )
+    user_ids = [10**17 + id for id in range(ids)]
+    await backend.write_many("user_lang", dict.fromkeys(user_ids, b"vi-vn"))
+
+    lookups = 0
+    deadline = monotonic() + seconds
+
+    async def worker() -> None:
+        nonlocal lookups
+        while monotonic() < deadline:
+            await backend.get("user_lang", choice(user_ids))
+            lookups += 1
+
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+
+    await backend.write_many("user_lang", dict.fromkeys(user_ids))
+    await backend.close()
+    return lookups / seconds
+
+
+async def main():
+    from config import config
+
+    if len(sys.argv) < 2 or sys.argv[1] not in ("reshard", "benchmark"):
+        print("Usage: python -m modules.sharding reshard|benchmark")
+        return
+
+    if sys.argv[1] == "reshard":
+        backend = ShardedRedisBackend(config.redis)
+        for table in TABLES:
+            print(f"{table}: moved {await backend.reshard(table)}")
+        await backend.close()
+        return
+
+    for nodes in range(1, len(config.redis.shards) + 1):
+        throughput = await benchmark(config.redis, nodes)
+        print(f"{nodes} nodes: {throughput:.0f} lookups/s")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
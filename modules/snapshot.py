@@ -0,0 +1,66 @@
+"""
+Snapshot of the in-process caches, so a restart doesn't start cold.
+
+Layout: magic, version, written at (unix time), msgpack body mapping a
+section name to its entries.
+"""
+
+import mmap
+import os
+import struct
+from time import time
+from typing import Any
+
+import msgpack
+
+MAGIC = b"ADCS"
+VERSION = 1
+PREAMBLE = struct.Struct("<4sHd")
+
+
+class SnapshotError(Exception):
+    """
+    Raised when a snapshot is missing, too old or corrupt.
+    """
+
+
+def write_snapshot(path: str, sections: dict[str, Any]) -> int:
+    """
+    Write a snapshot atomically, return its size in bytes
+    """
+
+    data = PREAMBLE.pack(MAGIC, VERSION, time()) + msgpack.packb(sections)
+    temporary = f"{path}.tmp"
+    with open(temporary, "wb") as file:
+        file.write(data)
+    os.replace(temporary, path)
+    return len(data)
+
+
+def read_snapshot(path: str, max_age: float) -> tuple[dict[str, Any], float]:
+    """
+    Map a snapshot and return its sections and age in seconds
+    """
+
+    try:
+        with open(path, "rb") as file, mmap.mmap(
+            file.fileno(), 0, access = mmap.ACCESS_READ
+        ) as mapped:
+            magic, version, written_at = PREAMBLE.unpack_from(mapped)
+            if magic != MAGIC or version != VERSION:
+                raise SnapshotError(
+                    f"{path} is not a version {VERSION} snapshot"
+                )
+
+            age = time() - written_at
+            if age > max_age:
+                raise SnapshotError(f"{path} is {age:.0f}s old")
+
+            with memoryview(mapped) as view:
+                sections = msgpack.unpackb(view[PREAMBLE.size:])
+    except (OSError, ValueError, struct.error) as error:
+        raise SnapshotError(f"Can't read {path}: {error}") from error
+
+    if not isinstance(sections, dict):
+        raise SnapshotError(f"{path} is corrupt")
+    return sections, age
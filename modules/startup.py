@@ -0,0 +1,126 @@
+"""
+Concurrent startup phases and the readiness barrier.
+"""
+
+import asyncio
+from time import perf_counter
+from typing import Any, Awaitable, TypeVar
+
+from modules import importtime
+from modules.log import logger
+
+T = TypeVar("T")
+
+# seconds events wait for startup before being handled anyway, Discord
+# wants interactions answered within 3
+INTERACTION_READY_TIMEOUT = 2
+MESSAGE_READY_TIMEOUT = 30
+# seconds to wait for the first cache refresh before giving up on it
+CACHE_WARMUP_TIMEOUT = 30
+# seconds after which the barrier opens even if a phase still runs, the
+# Lavalink pool for one retries forever
+READY_DEADLINE = 30
+
+started_at = perf_counter()
+# phase -> (start, end) in seconds since the process started
+timeline: dict[str, tuple[float, float]] = {}
+# set once every startup phase finished, failed ones included, or once
+# the deadline passed
+ready = asyncio.Event()
+
+global background
+background: asyncio.Task | None = None
+
+
+async def timed(name: str, phase: Awaitable[T]) -> T:
+    """
+    Run a phase and record it in the timeline
+    """
+
+    start = perf_counter() - started_at
+    try:
+        return await phase
+    finally:
+        end = perf_counter() - started_at
+        timeline[name] = (start, end)
+        logger.info(f"Startup phase {name} took {(end - start) * 1000:.0f}ms")
+
+
+async def _gather(phases: dict[str, Awaitable[Any]]) -> list[Any]:
+    return await asyncio.gather(
+        *(timed(name, phase) for name, phase in phases.items()),
+        return_exceptions = True,
+    )
+
+
+async def run(phases: dict[str, Awaitable[Any]]) -> None:
+    """
+    Run phases concurrently, raise the first failure once all finished
+    """
+
+    results = await _gather(phases)
+    if ready.is_set():
+        # the background phases finished first and logged without these
+        log_timeline()
+
+    for result in results:
+        if isinstance(result, BaseException):
+            raise result
+
+
+def start_background(phases: dict[str, Awaitable[Any]]) -> None:
+    """
+    Run phases concurrently without waiting, then open the barrier
+
+    Failures are logged, the bot runs without that subsystem. Phases still
+    running at the deadline keep running, events stop waiting for them.
+    """
+
+    async def run_then_ready() -> None:
+        try:
+            for name, result in zip(phases, await _gather(phases)):
+                if isinstance(result, BaseException):
+                    logger.error(f"Startup phase {name} failed: {result!r}")
+        finally:
+            deadline.cancel()
+            ready.set()
+            log_timeline()
+            logger.info(importtime.report())
+
+    def open_late() -> None:
+        logger.warning(
+            "Startup phases " +
+            ", ".join(name for name in phases if name not in timeline) +
+            f" still running after {READY_DEADLINE}s, not waiting for them"
+        )
+        ready.set()
+
+    deadline = asyncio.get_running_loop().call_later(READY_DEADLINE, open_late)
+
+    global background
+    background = asyncio.create_task(run_then_ready())
+
+
+async def wait_ready(timeout: float) -> bool:
+    """
+    Wait for startup to finish, return False if it didn't in time
+    """
+
+    if ready.is_set():
+        return True
+
+    try:
+        await asyncio.wait_for(ready.wait(), timeout)
+    except asyncio.TimeoutError:
+        return False
+    return True
+
+
+def log_timeline() -> None:
+    phases = sorted(timeline.items(), key = lambda item: item[1])
+    logger.info(
+        "Startup timeline:\n" + "\n".join(
+            f"  {name:<12} {start:7.3f}s -> {end:7.3f}s"
+            for name, (start, end) in phases
+        )
+    )
@@ -0,0 +1,809 @@
+"""
+Storage backends for the settings kept by modules.database.
+
+Every backend stores the same tables (prefix, user_lang and op), each
+mapping a Discord ID to a bytes value. Run `python -m modules.storage` to
+benchmark them.
+"""
+
+import asyncio
+import sqlite3
+from abc import ABC, abstractmethod
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, replace
+from time import monotonic
+from typing import AsyncIterator, Awaitable, Callable, TypeVar
+
+from redis.asyncio import BlockingConnectionPool, Redis
+from redis.exceptions import ConnectionError as RedisConnectionError
+from redis.exceptions import TimeoutError as RedisTimeoutError
+
+from modules.log import logger
+from modules.vault import Redis as RedisConfig
+from modules.vault import Storage as StorageConfig
+
+TABLES = ("prefix", "user_lang", "op")
+
+T = TypeVar("T")
+
+
+class StorageBackend(ABC):
+    """
+    Where settings live
+    """
+
+    name: str
+    # errors meaning the backend is unreachable, not that a value is bad
+    connection_errors: tuple[type[Exception], ...] = ()
+
+    @abstractmethod
+    async def get(self, table: str, id: int) -> bytes | None:
+        ...
+
+    @abstractmethod
+    async def get_many(self, table: str, ids: list[int]) -> list[bytes | None]:
+        """
+        Return values in input order
+        """
+
+    @abstractmethod
+    async def put(self, table: str, id: int, value: bytes) -> None:
+        ...
+
+    @abstractmethod
+    async def delete(self, table: str, id: int) -> None:
+        ...
+
+    @abstractmethod
+    async def scan_ids(self, table: str) -> set[int]:
+        """
+        Return every ID stored in a table
+        """
+
+    async def write_many(
+        self, table: str, values: dict[int, bytes | None]
+    ) -> None:
+        """
+        Write many IDs at once, None deletes
+
+        Backends that can batch writes override this.
+        """
+
+        for id, value in values.items():
+            if value is None:
+                await self.delete(table, id)
+            else:
+                await self.put(table, id, value)
+
+    async def publish(self, channel: str, message: str) -> None:
+        """
+        Send a message to every process sharing this backend
+        """
+
+    async def subscribe(self, channel: str) -> AsyncIterator[str | None]:
+        """
+        Yield messages from other processes, None after every (re)connect
+
+        Backends only one process uses never have messages.
+        """
+
+        yield None
+        await asyncio.Event().wait()
+
+    def note_write(self, table: str, id: int) -> None:
+        """
+        Hear that another process wrote an ID
+
+        Backends reading from lagging copies read it from the source for a
+        while.
+        """
+
+    async def close(self) -> None:
+        ...
+
+
+# --------------------------------------------- memory ---------------------------------------------
+
+
+class MemoryBackend(StorageBackend):
+    """
+    Keeps everything in this process, lost on restart
+    """
+
+    name = "memory"
+
+    def __init__(self) -> None:
+        self.tables: dict[str, dict[int, bytes]] = {
+            table: {}
+            for table in TABLES
+        }
+
+    async def get(self, table: str, id: int) -> bytes | None:
+        return self.tables[table].get(id)
+
+    async def get_many(self, table: str, ids: list[int]) -> list[bytes | None]:
+        values = self.tables[table]
+        return [values.get(id) for id in ids]
+
+    async def put(self, table: str, id: int, value: bytes) -> None:
+        self.tables[table][id] = value
+
+    async def delete(self, table: str, id: int) -> None:
+        self.tables[table].pop(id, None)
+
+    async def scan_ids(self, table: str) -> set[int]:
+        return set(self.tables[table])
+
+
+# --------------------------------------------- sqlite ---------------------------------------------
+
+
+class SQLiteBackend(StorageBackend):
+    """
+    Embedded SQLite file, queried on a single worker thread
+    """
+
+    name = "sqlite"
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+        # one thread, so the connection is never shared between threads
+        self.executor = ThreadPoolExecutor(
+            max_workers = 1, thread_name_prefix = "sqlite"
+        )
+        self.connection: sqlite3.Connection | None = None
+
+    def _connect(self) -> sqlite3.Connection:
+        if not self.connection:
+            self.connection = sqlite3.connect(self.path)
+            self.connection.execute("PRAGMA journal_mode = WAL")
+            self.connection.execute(
+                "CREATE TABLE IF NOT EXISTS settings (" +
+                "name TEXT, id INTEGER, value BLOB, PRIMARY KEY (name, id)" +
+                ") WITHOUT ROWID"
+            )
+        return self.connection
+
+    async def _run(self, query: str, *params) -> list[tuple]:
+
+        def run() -> list[tuple]:
+            connection = self._connect()
+            with connection:
+                return connection.execute(query, params).fetchall()
+
+        return await asyncio.get_running_loop().run_in_executor(
+            self.executor, run
+        )
+
+    async def get(self, table: str, id: int) -> bytes | None:
+        rows = await self._run(
+            "SELECT value FROM settings WHERE name = ? AND id = ?", table, id
+        )
+        return rows[0][0] if rows else None
+
+    async def get_many(self, table: str, ids: list[int]) -> list[bytes | None]:
+        if not ids:
+            return []
+
+        values: dict[int, bytes] = {}
+        # stay under SQLite's bound parameter limit
+        for start in range(0, len(ids), 500):
+            chunk = ids[start:start + 500]
+            values.update(
+                await self._run(
+                    "SELECT id, value FROM settings " +
+                    "WHERE name = ? AND id IN (" +
+                    ", ".join("?" * len(chunk)) + ")",
+                    table,
+                    *chunk,
+                )
+            )
+        return [values.get(id) for id in ids]
+
+    async def put(self, table: str, id: int, value: bytes) -> None:
+        await self._run(
+            "INSERT OR REPLACE INTO settings (name, id, value) " +
+            "VALUES (?, ?, ?)",
+            table,
+            id,
+            value,
+        )
+
+    async def delete(self, table: str, id: int) -> None:
+        await self._run(
+            "DELETE FROM settings WHERE name = ? AND id = ?", table, id
+        )
+
+    async def scan_ids(self, table: str) -> set[int]:
+        rows = await self._run("SELECT id FROM settings WHERE name = ?", table)
+        return { id for id, in rows }
+
+    async def write_many(
+        self, table: str, values: dict[int, bytes | None]
+    ) -> None:
+
+        def run() -> None:
+            connection = self._connect()
+            # one transaction, so one fsync for the whole batch
+            with connection:
+                connection.executemany(
+                    "INSERT OR REPLACE INTO settings (name, id, value) " +
+                    "VALUES (?, ?, ?)",
+                    [(table, id, value)
+                     for id, value in values.items()
+                     if value is not None],
+                )
+                connection.executemany(
+                    "DELETE FROM settings WHERE name = ? AND id = ?",
+                    [(table, id)
+                     for id, value in values.items()
+                     if value is None],
+                )
+
+        await asyncio.get_running_loop().run_in_executor(self.executor, run)
+
+    async def close(self) -> None:
+
+        def close():
+            if self.connection:
+                self.connection.close()
+                self.connection = None
+
+        await asyncio.get_running_loop().run_in_executor(self.executor, close)
+        self.executor.shutdown()
+
+
+# --------------------------------------------- redis ----------------------------------------------
+
+
+@dataclass
+class PoolStats:
+    acquisitions: int = 0
+    timeouts: int = 0
+    total_wait: float = 0
+    max_wait: float = 0
+
+    @property
+    def average_wait(self) -> float:
+        return self.total_wait / self.acquisitions if self.acquisitions else 0
+
+
+class InstrumentedConnectionPool(BlockingConnectionPool):
+    """
+    Blocking connection pool that records how long commands wait for one
+    """
+
+    def __init__(self, *args, **kwargs) -> None:
+        # tracked here rather than read from redis-py's private lists
+        self.created = 0
+        self.acquired: set = set()
+        super().__init__(*args, **kwargs)
+        self.stats = PoolStats()
+
+    def reset(self) -> None:
+        super().reset()
+        self.created = 0
+        self.acquired = set()
+
+    def make_connection(self):
+        self.created += 1
+        return super().make_connection()
+
+    async def release(self, connection) -> None:
+        # also called for a connection that failed to connect
+        self.acquired.discard(connection)
+        await super().release(connection)
+
+    @property
+    def in_use(self) -> int:
+        return len(self.acquired)
+
+    @property
+    def idle(self) -> int:
+        return self.created - self.in_use
+
+    async def get_connection(self, *args, **kwargs):
+        started = monotonic()
+        try:
+            connection = await super().get_connection(*args, **kwargs)
+        except RedisConnectionError:
+            self.stats.timeouts += 1
+            raise
+
+        self.acquired.add(connection)
+        waited = monotonic() - started
+        self.stats.acquisitions += 1
+        self.stats.total_wait += waited
+        self.stats.max_wait = max(self.stats.max_wait, waited)
+        return connection
+
+    def metrics(self) -> dict[str, float]:
+        """
+        Return a snapshot of the connection pool usage
+        """
+
+        return {
+            "max_connections": self.max_connections,
+            "in_use": self.in_use,
+            "idle": self.idle,
+            "acquisitions": self.stats.acquisitions,
+            "timeouts": self.stats.timeouts,
+            "average_wait": self.stats.average_wait,
+            "max_wait": self.stats.max_wait,
+        }
+
+
+@dataclass
+class EndpointStats:
+    calls: int = 0
+    errors: int = 0
+    total_latency: float = 0
+    max_latency: float = 0
+
+    @property
+    def average_latency(self) -> float:
+        return self.total_latency / self.calls if self.calls else 0
+
+
+# tables that may be split into buckets, op is tiny and stays flat
+BUCKETED_TABLES = ("prefix", "user_lang")
+
+# moves fields from the flat hash into their buckets, re-reading each one
+# so a concurrent write or delete is never overwritten or resurrected
+MIGRATE_SCRIPT = """
+local moved = 0
+for i = 1, #ARGV do
+    local value = redis.call("HGET", KEYS[1], ARGV[i])
+    if value then
+        redis.call("HSETNX", KEYS[i + 1], ARGV[i], value)
+        redis.call("HDEL", KEYS[1], ARGV[i])
+        moved = moved + 1
+    end
+end
+return moved
+"""
+
+# recently written IDs kept before expired ones are pruned
+RECENT_WRITES_LIMIT = 10000
+
+
+def redis_url(config: RedisConfig) -> str:
+    return f"redis://{'' if not config.username and not config.password else f'{config.username}:{config.password}@'}{config.host}:{config.port}/{config.database}"
+
+
+class RedisBackend(StorageBackend):
+    """
+    Redis hashes shared by every bot process
+    """
+
+    name = "redis"
+    connection_errors = (RedisConnectionError, RedisTimeoutError)
+
+    def __init__(self, config: RedisConfig = RedisConfig()) -> None:
+        self.pool = self._make_pool(config)
+        self.redis = Redis(connection_pool = self.pool)
+
+        # bucketed tables are split into this many small hashes, 0 keeps one
+        # flat hash each. Small hashes stay in Redis' listpack encoding.
+        self.buckets = config.buckets
+        # flat hashes that may still hold entries not migrated to buckets,
+        # assume there are until a scan says otherwise
+        self.legacy_hashes: set[str] = set(
+            BUCKETED_TABLES if self.buckets else ()
+        )
+
+        # endpoint name -> client, reads are spread over the replicas
+        self.endpoints: dict[str, Redis] = { "primary": self.redis }
+        self.replicas: list[str] = []
+        for replica in config.replicas:
+            name = f"{replica.host}:{replica.port}"
+            self.endpoints[name] = Redis(
+                connection_pool = self._make_pool(
+                    replace(config, host = replica.host, port = replica.port)
+                )
+            )
+            self.replicas.append(name)
+        self.endpoint_stats = {
+            name: EndpointStats()
+            for name in self.endpoints
+        }
+        self._next_replica = 0
+
+        # (table, ID) -> when reads may go back to the replicas
+        self.read_your_writes = config.read_your_writes
+        self.recent_writes: dict[tuple[str, int], float] = {}
+
+    @staticmethod
+    def _make_pool(config: RedisConfig) -> InstrumentedConnectionPool:
+        return InstrumentedConnectionPool.from_url(
+            redis_url(config),
+            max_connections = config.max_connections,
+            timeout = config.pool_timeout,
+            health_check_interval = config.health_check_interval,
+            socket_timeout = config.socket_timeout,
+            socket_connect_timeout = config.socket_connect_timeout,
+        )
+
+    def bucketed(self, table: str) -> bool:
+        return bool(self.buckets) and table in BUCKETED_TABLES
+
+    def bucket_key(self, table: str, id: int) -> str:
+        """
+        Return the Redis key holding an ID's field
+        """
+
+        if self.bucketed(table):
+            return f"{table}:{id % self.buckets}"
+        return table
+
+    def _has_legacy(self, table: str) -> bool:
+        return self.bucketed(table) and table in self.legacy_hashes
+
+    def note_write(self, table: str, id: int) -> None:
+        if not self.replicas:
+            return
+
+        now = monotonic()
+        if len(self.recent_writes) >= RECENT_WRITES_LIMIT:
+            self.recent_writes = {
+                key: until
+                for key, until in self.recent_writes.items()
+                if until > now
+            }
+        self.recent_writes[(table, id)] = now + self.read_your_writes
+
+    def _read_endpoint(self, table: str, ids: list[int]) -> str:
+        """
+        Pick where to read IDs from, the primary if any was just written
+        """
+
+        if not self.replicas:
+            return "primary"
+
+        now = monotonic()
+        if self.recent_writes and any(
+            self.recent_writes.get((table, id), 0) > now for id in ids
+        ):
+            return "primary"
+
+        self._next_replica = (self._next_replica + 1) % len(self.replicas)
+        return self.replicas[self._next_replica]
+
+    async def _timed(self, endpoint: str, call: Awaitable[T]) -> T:
+        stats = self.endpoint_stats[endpoint]
+        started = monotonic()
+        try:
+            return await call
+        except self.connection_errors:
+            stats.errors += 1
+            raise
+        finally:
+            elapsed = monotonic() - started
+            stats.calls += 1
+            stats.total_latency += elapsed
+            stats.max_latency = max(stats.max_latency, elapsed)
+
+    async def _read(
+        self, table: str, ids: list[int], read: Callable[[Redis], Awaitable[T]]
+    ) -> T:
+        """
+        Run a read on a replica, falling back to the primary if it's down
+        """
+
+        endpoint = self._read_endpoint(table, ids)
+        try:
+            return await self._timed(endpoint, read(self.endpoints[endpoint]))
+        except self.connection_errors:
+            if endpoint == "primary":
+                raise
+            return await self._timed("primary", read(self.redis))
+
+    def endpoint_metrics(self) -> dict[str, dict[str, float]]:
+        """
+        Return the call count and latency of every endpoint
+        """
+
+        return {
+            name: {
+                "calls": stats.calls,
+                "errors": stats.errors,
+                "average_latency": stats.average_latency,
+                "max_latency": stats.max_latency,
+            }
+            for name, stats in self.endpoint_stats.items()
+        }
+
+    async def get(self, table: str, id: int) -> bytes | None:
+        return await self._read(
+            table, [id], lambda redis: self._get(redis, table, id)
+        )
+
+    async def _get(self, redis: Redis, table: str, id: int) -> bytes | None:
+        result = await redis.hget(self.bucket_key(table, id), str(id))
+        if result is None and self._has_legacy(table):
+            result = await redis.hget(table, str(id))
+        return result
+
+    async def get_many(self, table: str, ids: list[int]) -> list[bytes | None]:
+        if not ids:
+            return []
+
+        return await self._read(
+            table, ids, lambda redis: self._get_many(redis, table, ids)
+        )
+
+    async def _get_many(self, redis: Redis, table: str,
+                        ids: list[int]) -> list[bytes | None]:
+        if not self.bucketed(table):
+            return await redis.hmget(table, [str(id) for id in ids])
+
+        grouped: dict[str, list[int]] = {}
+        for id in ids:
+            grouped.setdefault(self.bucket_key(table, id), []).append(id)
+
+        async with redis.pipeline(transaction = False) as pipeline:
+            for key, bucket_ids in grouped.items():
+                pipeline.hmget(key, [str(id) for id in bucket_ids])
+            replies = await pipeline.execute()
+
+        results: dict[int, bytes | None] = {}
+        for bucket_ids, reply in zip(grouped.values(), replies):
+            results.update(zip(bucket_ids, reply))
+
+        missing = [id for id in ids if results[id] is None]
+        if missing and self._has_legacy(table):
+            results.update(
+                zip(
+                    missing, await
+                    redis.hmget(table, [str(id) for id in missing])
+                )
+            )
+
+        return [results[id] for id in ids]
+
+    async def scan_ids(self, table: str) -> set[int]:
+        # on the primary, an ID written just before a lagging replica saw it
+        # would be left out of the index and filtered for good
+        return await self._timed("primary", self._scan_ids(table))
+
+    async def _scan_ids(self, table: str) -> set[int]:
+        ids: set[int] = set()
+        async for key, _ in self.redis.hscan_iter(table, count = 1000):
+            ids.add(int(key))
+
+        if not self.bucketed(table):
+            return ids
+
+        if ids:
+            self.legacy_hashes.add(table)
+        else:
+            self.legacy_hashes.discard(table)
+
+        async for key in self.redis.scan_iter(
+            match = f"{table}:*", count = 1000
+        ):
+            ids.update(int(field) for field in await self.redis.hkeys(key))
+        return ids
+
+    async def put(self, table: str, id: int, value: bytes) -> None:
+        self.note_write(table, id)
+        await self._timed("primary", self._put(table, id, value))
+
+    async def _put(self, table: str, id: int, value: bytes) -> None:
+        if not self._has_legacy(table):
+            await self.redis.hset(self.bucket_key(table, id), str(id), value)
+            return
+
+        async with self.redis.pipeline(transaction = True) as pipeline:
+            pipeline.hset(self.bucket_key(table, id), str(id), value)
+            pipeline.hdel(table, str(id))
+            await pipeline.execute()
+
+    async def delete(self, table: str, id: int) -> None:
+        self.note_write(table, id)
+        await self._timed("primary", self._delete(table, id))
+
+    async def _delete(self, table: str, id: int) -> None:
+        if not self._has_legacy(table):
+            await self.redis.hdel(self.bucket_key(table, id), str(id))
+            return
+
+        async with self.redis.pipeline(transaction = True) as pipeline:
+            pipeline.hdel(self.bucket_key(table, id), str(id))
+            pipeline.hdel(table, str(id))
+            await pipeline.execute()
+
+    async def write_many(
+        self, table: str, values: dict[int, bytes | None]
+    ) -> None:
+        for id in values:
+            self.note_write(table, id)
+        await self._timed("primary", self._write_many(table, values))
+
+    async def _write_many(
+        self, table: str, values: dict[int, bytes | None]
+    ) -> None:
+        legacy = self._has_legacy(table)
+        async with self.redis.pipeline(transaction = False) as pipeline:
+            for id, value in values.items():
+                if value is None:
+                    pipeline.hdel(self.bucket_key(table, id), str(id))
+                else:
+                    pipeline.hset(self.bucket_key(table, id), str(id), value)
+                if legacy:
+                    pipeline.hdel(table, str(id))
+            await pipeline.execute()
+
+    async def publish(self, channel: str, message: str) -> None:
+        await self.redis.publish(channel, message)
+
+    async def subscribe(self, channel: str) -> AsyncIterator[str | None]:
+        async with self.redis.pubsub() as pubsub:
+            await pubsub.subscribe(channel)
+            yield None
+
+            async for message in pubsub.listen():
+                if message["type"] == "message":
+                    yield message["data"].decode()
+
+    async def close(self) -> None:
+        for redis in self.endpoints.values():
+            await redis.close()
+
+    async def migrate_to_buckets(
+        self, table: str, batch_size: int = 500
+    ) -> int:
+        """
+        Move a flat hash into buckets while the bot keeps running
+
+        Returns how many fields were moved.
+        """
+
+        assert self.bucketed(table), "table isn't bucketed"
+
+        migrate = self.redis.register_script(MIGRATE_SCRIPT)
+        moved = 0
+        cursor = 0
+        while True:
+            cursor, fields = await self.redis.hscan(
+                table, cursor, count = batch_size
+            )
+            if fields:
+                ids = [int(field) for field in fields]
+                moved += await migrate(
+                    keys = [
+                        table, *(self.bucket_key(table, id) for id in ids)
+                    ],
+                    args = [str(id) for id in ids],
+                )
+            if cursor == 0:
+                break
+
+        if not await self.redis.exists(table):
+            self.legacy_hashes.discard(table)
+        logger.info(
+            f"Moved {moved} {table} entries into {self.buckets} buckets"
+        )
+        return moved
+
+    async def memory_report(self, table: str) -> dict[str, dict[str, int]]:
+        """
+        Compare the memory used by a flat hash and its buckets
+        """
+
+        report: dict[str, dict[str, int]] = {}
+
+        async def add(layout: str, key: str) -> None:
+            usage = await self.redis.memory_usage(key, samples = 0) or 0
+            encoding = await self.redis.object("encoding", key)
+            if isinstance(encoding, bytes):
+                encoding = encoding.decode()
+            stats = report.setdefault(
+                layout, {
+                    "keys": 0,
+                    "bytes": 0,
+                    "entries": 0
+                }
+            )
+            stats["keys"] += 1
+            stats["bytes"] += usage
+            stats["entries"] += await self.redis.hlen(key)
+            stats[encoding] = stats.get(encoding, 0) + 1
+
+        if await self.redis.exists(table):
+            await add("flat", table)
+
+        async for key in self.redis.scan_iter(
+            match = f"{table}:*", count = 1000
+        ):
+            await add("bucketed", key.decode())
+
+        return report
+
+
+def make_backend(
+    storage: StorageConfig = StorageConfig(),
+    redis: RedisConfig = RedisConfig()
+) -> StorageBackend:
+    """
+    Create the backend chosen in the config
+    """
+
+    if storage.backend == "memory":
+        return MemoryBackend()
+    if storage.backend == "sqlite":
+        return SQLiteBackend(storage.sqlite_path)
+    if redis.shards:
+        # imported here, modules.sharding builds on this module
+        from modules.sharding import ShardedRedisBackend
+        return ShardedRedisBackend(redis)
+    return RedisBackend(redis)
+
+
+# ------------------------------------------- benchmark --------------------------------------------
+
+
+async def benchmark(backend: StorageBackend,
+                    rounds: int = 1000) -> dict[str, float]:
+    """
+    Return the mean latency of each operation in microseconds
+
+    Writes and then deletes made up user IDs in user_lang.
+    """
+
+    ids = [10**17 + id for id in range(rounds)]
+    value = b"vi-vn"
+    timings: dict[str, float] = {}
+
+    async def measure(operation: str, run) -> None:
+        started = monotonic()
+        for id in ids:
+            await run(id)
+        timings[operation] = (monotonic() - started) / rounds * 10**6
+
+    await measure("put", lambda id: backend.put("user_lang", id, value))
+    await measure("get", lambda id: backend.get("user_lang", id))
+    await measure("get miss", lambda id: backend.get("prefix", id))
+
+    started = monotonic()
+    await backend.get_many("user_lang", ids)
+    timings[f"get_many ({rounds})"] = (monotonic() - started) * 10**6
+
+    started = monotonic()
+    await backend.scan_ids("user_lang")
+    timings[f"scan_ids ({rounds})"] = (monotonic() - started) * 10**6
+
+    await measure("delete", lambda id: backend.delete("user_lang", id))
+    return timings
+
+
+async def main():
+    from os import remove
+    from tempfile import mkdtemp
+
+    path = f"{mkdtemp()}/benchmark.db"
+    backends: list[StorageBackend] = [MemoryBackend(), SQLiteBackend(path)]
+    try:
+        from config import config
+        backends.append(RedisBackend(config.redis))
+    except ImportError:
+        print("No config.py, skipping Redis")
+
+    for backend in backends:
+        try:
+            timings = await benchmark(backend)
+        except backend.connection_errors as error:
+            print(f"{backend.name}: unreachable ({error})")
+            continue
+        finally:
+            await backend.close()
+
+        print(backend.name)
+        for operation, micros in timings.items():
+            print(f"  {operation}: {micros:.1f}us")
+
+    remove(path)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,42 @@
+"""
+Localized format templates.
+"""
+
+import re
+
+PLACEHOLDER = re.compile(
+    r"%(?:\([^)]*\))?[#0 +-]*(?:\*|\d+)?(?:\.(?:\*|\d+))?[diouxXeEfFgGcrsa%]"
+)
+
+
+class Template(str):
+    """
+    Localized string with its %-placeholders counted at load time
+    """
+
+    placeholders: int
+
+
+def compile_template(value: str) -> str:
+    """
+    Return a Template if the string has placeholders, else the string
+    """
+
+    count = sum(
+        1 for placeholder in PLACEHOLDER.finditer(value)
+        if placeholder.group() != "%%"
+    )
+    if not count:
+        return value
+
+    template = Template(value)
+    template.placeholders = count
+    return template
+
+
+def placeholders(value: str) -> int:
+    """
+    Return how many arguments a localized string must be formatted with
+    """
+
+    return getattr(value, "placeholders", 0)
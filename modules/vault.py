@@ -2,7 +2,8 @@
 Vault for the bot secrets and variables.
 """
 
-from dataclasses import dataclass
+from dataclasses import dataclass, field
+from typing import Literal
 
 
 @dataclass
@@ -17,6 +18,19 @@ class LavalinkNode:
     password: str = "youshallnotpass"
 
 
+@dataclass
+class RedisReplica:
+    host: str = "localhost"
+    port: int = 6380
+
+
+@dataclass
+class RedisShard:
+    host: str = "localhost"
+    port: int = 6379
+    replicas: list[RedisReplica] = field(default_factory = list)
+
+
 @dataclass
 class Redis:
     host: str = "localhost"
@@ -24,6 +38,50 @@ class Redis:
     username: str = ""
     password: str = ""
     database: int = 0
+    max_connections: int = 5
+    # seconds to wait for a free connection before failing
+    pool_timeout: float = 5
+    health_check_interval: int = 30
+    socket_timeout: float = 5
+    socket_connect_timeout: float = 5
+    # split prefix and user_lang into this many small hashes, 0 to disable
+    buckets: int = 0
+    # read only copies of the primary, reads are spread over them
+    replicas: list[RedisReplica] = field(default_factory = list)
+    # seconds an ID is read from the primary after it was written, so the
+    # writer never sees a replica that hasn't caught up yet
+    read_your_writes: float = 2
+    # spread the settings over these nodes instead of host and port, by
+    # consistent hashing of their keys. Needs buckets to spread prefix and
+    # user_lang, the first shard also carries pub/sub.
+    shards: list[RedisShard] = field(default_factory = list)
+    # the shards before the last change, read from until resharded
+    previous_shards: list[RedisShard] = field(default_factory = list)
+
+
+@dataclass
+class Storage:
+    # redis for shared deployments, sqlite or memory for a single process
+    backend: Literal["redis", "sqlite", "memory"] = "redis"
+    sqlite_path: str = "akatsuki_du_ca.db"
+    # serve cached settings or defaults instead of waiting on a stalled
+    # backend, and replay failed writes once it's back
+    resilient: bool = True
+    call_timeout: float = 0.5
+    scan_timeout: float = 60
+    # consecutive failures before calls stop, seconds before trying again
+    breaker_threshold: int = 5
+    breaker_cooldown: float = 10
+    replay_limit: int = 1000
+    # buffer writes, keeping only the last one per ID, and flush them in
+    # batches every write_behind_interval seconds or once the batch is full
+    write_behind: bool = False
+    write_behind_interval: float = 0.5
+    write_behind_batch: int = 100
+    # caches are saved here on shutdown and loaded on boot, "" to disable
+    snapshot_path: str = "cache_snapshot.bin"
+    # seconds after which a snapshot is too stale to start from
+    snapshot_max_age: float = 86400
 
 
 @dataclass
@@ -39,6 +97,10 @@ class Bot:
     prefix: str
     home_guild: HomeGuild
     channels: ChannelsConfig
+    # reload language files as soon as they change
+    watch_lang: bool = False
+    # seconds between metrics log lines, 0 to only serve them over IPC
+    metrics_interval: float = 300
 
 
 @dataclass
@@ -57,9 +119,25 @@ class API:
     tenor: TenorAPI
 
 
+@dataclass
+class Features:
+    # cog class names to load, see cogs.COGS, None loads every cog
+    cogs: list[str] | None = None
+    # the IPC server of the dashboard, extension "api"
+    ipc: bool = True
+    jishaku: bool = True
+    # report the memory every cog module allocates, slows their imports
+    trace_memory: bool = False
+
+    def enabled(self, cog: str) -> bool:
+        return self.cogs is None or cog in self.cogs
+
+
 @dataclass
 class Config:
     bot: Bot
     api: API
     lavalink_nodes: list[LavalinkNode]
     redis: Redis
+    storage: Storage = field(default_factory = Storage)
+    features: Features = field(default_factory = Features)
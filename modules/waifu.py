@@ -2,18 +2,25 @@
 Waifu API module
 """
 
+from typing import TYPE_CHECKING
+
 from aiohttp import ClientSession
-from waifuim import WaifuAioClient
-from waifuim.types import Image
+
+if TYPE_CHECKING:
+    from waifuim import WaifuAioClient
+    from waifuim.types import Image
 
 global waifuim
-waifuim: WaifuAioClient | None = None
+waifuim: "WaifuAioClient | None" = None
 
 
-async def random_image(nsfw: bool = False) -> Image:
+async def random_image(nsfw: bool = False) -> "Image":
     global waifuim
 
     if not waifuim:
+        # imported on first use, most processes never ask for a waifu
+        from waifuim import WaifuAioClient
+
         waifuim = WaifuAioClient()
 
     image = await waifuim.search(is_nsfw = nsfw)
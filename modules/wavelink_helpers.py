@@ -4,8 +4,9 @@ from discord import Interaction, Member
 from wavelink import Playable, Playlist
 
 from models.music_player import Player
+from modules.context import InteractionContext
 from modules.exceptions import MusicException
-from modules.lang import Lang, get_lang
+from modules.lang import Lang
 from modules.log import logger
 
 VoiceCheck: TypeAlias = Callable[[Interaction], Awaitable[None]]
@@ -125,8 +126,7 @@ async def connect_check(
 
 
 async def connect(
-    interaction: Interaction,
-    lang: Lang,
+    context: InteractionContext,
     should_connect: bool = False,
     new_connection: bool = False,
     checks: list[VoiceCheck] = [],
@@ -135,6 +135,8 @@ async def connect(
     Initialize a player or connect to a voice channel if there are none.
     """
 
+    interaction, lang = context.interaction, context.lang
+
     await connect_check(interaction, new_connection = new_connection)
 
     assert interaction.guild
@@ -217,10 +219,11 @@ async def get_lang_and_player(
     assert interaction.guild
     assert interaction.user
 
-    await interaction.response.send_message("...")
-
-    lang = await get_lang(interaction.user.id)
+    # the lookups run while Discord acknowledges the response
+    context = await InteractionContext(interaction).resolve(
+        interaction.response.send_message("...")
+    )
 
-    return lang, await connect(
-        interaction, lang, should_connect = should_connect, checks = checks
+    return context.lang, await connect(
+        context, should_connect = should_connect, checks = checks
     )
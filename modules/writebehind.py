@@ -0,0 +1,200 @@
+"""
+Write-behind buffer for the storage backend.
+
+Bursts of setting changes (a user clicking through the language menu, a
+script resetting many prefixes) are collapsed to the last value per ID and
+written in one batch per table.
+"""
+
+import asyncio
+from dataclasses import dataclass
+from typing import AsyncIterator
+
+from modules.log import logger
+from modules.storage import StorageBackend
+from modules.vault import Storage as StorageConfig
+
+
+@dataclass
+class WriteBehindStats:
+    writes: int = 0
+    # writes replaced by a newer one before they were flushed
+    coalesced: int = 0
+    flushes: int = 0
+    flushed: int = 0
+
+
+class WriteBehindBackend(StorageBackend):
+    """
+    Buffer writes and flush them in batches on an interval or when full
+
+    Invalidation messages are held back until the writes before them are
+    flushed, so other processes never re-read a value that isn't there yet.
+    """
+
+    def __init__(
+        self, inner: StorageBackend, config: StorageConfig = StorageConfig()
+    ) -> None:
+        self.inner = inner
+        self.name = inner.name
+        self.connection_errors = inner.connection_errors
+
+        self.interval = config.write_behind_interval
+        self.batch_size = config.write_behind_batch
+        self.stats = WriteBehindStats()
+
+        # (table, ID) -> value to write or None to delete
+        self.pending: dict[tuple[str, int], bytes | None] = {}
+        # the batch being written right now, still served to reads
+        self.flushing: dict[tuple[str, int], bytes | None] = {}
+        self.pending_messages: dict[tuple[str, str], None] = {}
+        self.flush_lock = asyncio.Lock()
+        self._flusher: asyncio.Task | None = None
+        self._batch_flush: asyncio.Task | None = None
+
+    def buffered(self) -> dict[tuple[str, int], bytes | None]:
+        """
+        Return every write not confirmed by the backend yet, newest wins
+        """
+
+        if not self.flushing:
+            return self.pending
+        return { **self.flushing, **self.pending }
+
+    async def get(self, table: str, id: int) -> bytes | None:
+        buffered = self.buffered()
+        if (table, id) in buffered:
+            return buffered[(table, id)]
+        return await self.inner.get(table, id)
+
+    async def get_many(self, table: str, ids: list[int]) -> list[bytes | None]:
+        results = await self.inner.get_many(table, ids)
+        buffered = self.buffered()
+        if not buffered:
+            return results
+
+        return [
+            buffered.get((table, id), result)
+            for id, result in zip(ids, results)
+        ]
+
+    async def scan_ids(self, table: str) -> set[int]:
+        ids = await self.inner.scan_ids(table)
+        for (pending_table, id), value in list(self.buffered().items()):
+            if pending_table != table:
+                continue
+            if value is None:
+                ids.discard(id)
+            else:
+                ids.add(id)
+        return ids
+
+    async def put(self, table: str, id: int, value: bytes) -> None:
+        self._buffer(table, id, value)
+
+    async def delete(self, table: str, id: int) -> None:
+        self._buffer(table, id, None)
+
+    async def write_many(
+        self, table: str, values: dict[int, bytes | None]
+    ) -> None:
+        for id, value in values.items():
+            self._buffer(table, id, value)
+
+    def _buffer(self, table: str, id: int, value: bytes | None) -> None:
+        self.stats.writes += 1
+        if (table, id) in self.pending:
+            self.stats.coalesced += 1
+        self.pending[(table, id)] = value
+
+        if not self._flusher or self._flusher.done():
+            self._flusher = asyncio.create_task(self._flush_loop())
+        if len(self.pending) >= self.batch_size and (
+            not self._batch_flush or self._batch_flush.done()
+        ):
+            self._batch_flush = asyncio.create_task(self._try_flush())
+
+    async def publish(self, channel: str, message: str) -> None:
+        if not self.pending and not self.flushing:
+            await self.inner.publish(channel, message)
+            return
+
+        self.pending_messages[(channel, message)] = None
+
+    async def subscribe(self, channel: str) -> AsyncIterator[str | None]:
+        async for message in self.inner.subscribe(channel):
+            yield message
+
+    def note_write(self, table: str, id: int) -> None:
+        self.inner.note_write(table, id)
+
+    async def _try_flush(self) -> None:
+        try:
+            await self.flush()
+        except self.connection_errors as error:
+            logger.warning(f"Can't flush buffered writes: {error}")
+
+    async def _flush_loop(self) -> None:
+        while self.pending or self.pending_messages:
+            await asyncio.sleep(self.interval)
+            await self._try_flush()
+
+    async def flush(self) -> None:
+        """
+        Write every buffered value, one batch per table, then the messages
+        """
+
+        async with self.flush_lock:
+            if not self.pending and not self.pending_messages:
+                return
+
+            batch, self.pending = self.pending, {}
+            self.flushing = batch
+            messages, self.pending_messages = self.pending_messages, {}
+
+            tables: dict[str, dict[int, bytes | None]] = {}
+            for (table, id), value in batch.items():
+                tables.setdefault(table, {})[id] = value
+
+            try:
+                for table, values in tables.items():
+                    await self.inner.write_many(table, values)
+                for channel, message in messages:
+                    await self.inner.publish(channel, message)
+            except self.connection_errors:
+                # put back what wasn't overwritten meanwhile and retry later
+                self.pending = { **batch, **self.pending }
+                self.pending_messages = { **messages, **self.pending_messages }
+                raise
+            finally:
+                self.flushing = {}
+
+            self.stats.flushes += 1
+            self.stats.flushed += len(batch)
+
+    def metrics(self) -> dict[str, int]:
+        """
+        Return how many writes were buffered, coalesced and flushed
+        """
+
+        return {
+            "writes": self.stats.writes,
+            "coalesced": self.stats.coalesced,
+            "flushes": self.stats.flushes,
+            "flushed": self.stats.flushed,
+            "pending": len(self.pending),
+        }
+
+    async def close(self) -> None:
+        if self._flusher:
+            self._flusher.cancel()
+            self._flusher = None
+
+        try:
+            await self.flush()
+        except self.connection_errors as error:
+            logger.warning(
+                f"Lost {len(self.pending)} buffered writes: {error}"
+            )
+
+        await self.inner.close()